@@ -0,0 +1,196 @@
+"""Lexing of many short documents at once, stepping them together with NumPy.
+
+NumPy is an optional dependency: only this module imports it, and only
+Lexer.lex_batch imports this module.
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        "Lexer.lex_batch needs NumPy, install it with pip install numpy"
+    ) from error
+
+from .CompiledDFA import CompiledDFA
+from .Lexer import Lexer
+from .TokenStream import TokenBatch
+
+
+def lex_batch(lexer: Lexer, documents: list[str]) -> TokenBatch:
+    """Lexes every document like Lexer.lex_stream, in lockstep.
+
+    The documents are concatenated into one array of DFA columns.  Every
+    document that is not done yet is a lane with its own state, scan
+    position and last accepting position, and each round advances all
+    lanes by one character with fancy indexing into the table.  A lane
+    whose scan ends emits its token and restarts from q0 at the end of the
+    token.  The tokens of all the documents are returned in one set of
+    columns, and a document that fails gets its LexError instead of tokens
+    without affecting the others.  The scans are recorded in the stats of
+    an instrumented lexer like those of longest_match.
+    """
+    table = getattr(lexer.table, "table", lexer.table)
+    if not isinstance(table, CompiledDFA):
+        raise ValueError("only lexers with a compiled table can lex batches")
+
+    n_docs = len(documents)
+    lengths = np.fromiter(map(len, documents), dtype=np.int64, count=n_docs)
+    offsets = np.zeros(n_docs, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+
+    # one column per character of all the documents, end to end
+    text = "".join(documents)
+    code_points = np.frombuffer(
+        text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+    )
+    bounds = np.array(table.classes.bounds, dtype=np.int64)
+    class_columns = np.array(table.classes.columns, dtype=np.int64)
+    columns = class_columns[np.searchsorted(bounds, code_points, side="right") - 1]
+
+    d = np.frombuffer(table.d, dtype=np.intc).astype(np.int64)
+    accept = np.array(table.accept, dtype=np.int64)
+    halt = np.array(table.halt, dtype=bool)
+    n = table.n_classes
+    q0 = table.q0
+
+    # the state of every lane; empty documents have no tokens to find
+    lane = np.nonzero(lengths)[0]
+    offset = offsets[lane]
+    length = lengths[lane]
+    start = np.zeros(lane.size, dtype=np.int64)
+    pos = start.copy()
+    state = np.full(lane.size, q0, dtype=np.int64)
+    rule = np.full(lane.size, -1, dtype=np.int64)
+    match_end = start.copy()
+
+    found: list[tuple[np.ndarray, ...]] = []
+    failed: dict[int, int] = {}
+    # characters read by the scans that found a token and by the others
+    token_scans = failed_scans = 0
+    while lane.size:
+        state = d[state * n + columns[offset + pos]]
+        pos += 1
+        accepted = accept[state]
+        matched = accepted >= 0
+        rule = np.where(matched, accepted, rule)
+        match_end = np.where(matched, pos, match_end)
+
+        halted = halt[state]
+        ended = halted | (pos == length)
+        if not ended.any():
+            continue
+
+        scans = np.nonzero(ended)[0]
+        bad = (rule[scans] < 0) | (match_end[scans] == start[scans])
+        lengths_read = pos[scans] - start[scans]
+        token_scans += int(lengths_read[~bad].sum())
+        failed_scans += int(lengths_read[bad].sum())
+        for i in scans[bad].tolist():
+            # same stop as longest_match: the last character read, or the end
+            failed[int(lane[i])] = int(pos[i] - 1 if halted[i] else length[i])
+
+        good = scans[~bad]
+        found.append((lane[good], rule[good], start[good], match_end[good]))
+        start[good] = match_end[good]
+        pos[good] = match_end[good]
+        state[good] = q0
+        rule[good] = -1
+
+        done = np.zeros(lane.size, dtype=bool)
+        done[scans[bad]] = True
+        done[good] = match_end[good] == length[good]
+        if done.any():
+            keep = ~done
+            lane = lane[keep]
+            offset = offset[keep]
+            length = length[keep]
+            start = start[keep]
+            pos = pos[keep]
+            state = state[keep]
+            rule = rule[keep]
+            match_end = match_end[keep]
+
+    if found:
+        token_lanes, token_rules, token_starts, token_ends = (
+            np.concatenate(column) for column in zip(*found)
+        )
+    else:
+        empty = np.zeros(0, dtype=np.int64)
+        token_lanes, token_rules, token_starts, token_ends = (empty,) * 4
+
+    if table.keywords:
+        shift = offsets[token_lanes]
+        _find_keywords(
+            table, code_points, token_rules, shift + token_starts, shift + token_ends
+        )
+
+    if lexer.stats is not None:
+        consumed = int((token_ends - token_starts).sum())
+        lexer.stats.record_batch(
+            np.bincount(token_rules, minlength=len(lexer.spec)).tolist(),
+            token_scans + failed_scans,
+            consumed,
+            token_scans - consumed,
+        )
+
+    # skipped tokens and those of failed documents are dropped, the rest are
+    # grouped by document in order
+    kept = ~np.array(lexer.skip, dtype=bool)[token_rules]
+    if failed:
+        ok = np.ones(n_docs, dtype=bool)
+        ok[list(failed)] = False
+        kept &= ok[token_lanes]
+    order = np.argsort(token_lanes[kept], kind="stable")
+    bounds = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(token_lanes[kept], minlength=n_docs), out=bounds[1:])
+
+    # no offset or token count reaches the length of all the documents
+    typecode = "I" if len(text) < 1 << 32 else "Q"
+    return TokenBatch(
+        documents,
+        [name for name, _ in lexer.spec],
+        array("I", token_rules[kept][order].astype("I").tobytes()),
+        array(typecode, token_starts[kept][order].astype(typecode).tobytes()),
+        array(typecode, token_ends[kept][order].astype(typecode).tobytes()),
+        array(typecode, bounds.astype(typecode).tobytes()),
+        {doc: lexer._error(documents[doc], stop) for doc, stop in failed.items()},
+    )
+
+
+def _find_keywords(
+    table: CompiledDFA,
+    code_points: np.ndarray,
+    rules: np.ndarray,
+    firsts: np.ndarray,
+    lasts: np.ndarray,
+) -> None:
+    """Gives the tokens that are keywords their literal rule, in place.
+
+    The lexemes of each keyword length are gathered as rows of code points
+    and viewed as one opaque value each, so that they are looked up among
+    the keywords of that length with a binary search.
+    """
+    candidates = np.isin(rules, list(table.keyword_rules))
+    lengths = lasts - firsts
+    by_length: dict[int, list[tuple[str, int]]] = {}
+    for keyword, rule in table.keywords.items():
+        by_length.setdefault(len(keyword), []).append((keyword, rule))
+    for length, entries in by_length.items():
+        tokens = np.nonzero(candidates & (lengths == length))[0]
+        if not tokens.size:
+            continue
+        row = np.dtype((np.void, 4 * length))
+        lexemes = code_points[firsts[tokens, None] + np.arange(length)]
+        lexemes = np.ascontiguousarray(lexemes).view(row).ravel()
+        keywords = "".join(keyword for keyword, _ in entries)
+        keys = np.frombuffer(
+            keywords.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        ).view(row)
+        order = np.argsort(keys)
+        keys = keys[order]
+        keyword_rules = np.array([rule for _, rule in entries], dtype=np.int64)[order]
+        index = np.minimum(np.searchsorted(keys, lexemes), keys.size - 1)
+        hits = keys[index] == lexemes
+        rules[tokens[hits]] = keyword_rules[index[hits]]
@@ -0,0 +1,76 @@
+from .CompiledDFA import CompiledDFA
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+
+# bump whenever the layout of a cache entry or of CompiledDFA.to_bytes changes
+FORMAT_VERSION = 5
+
+_MAGIC = b"LXDFA"
+# magic, format version, byte order of the arrays, crc32 of the payload
+_HEADER = struct.Struct("<5sHcI")
+
+
+def spec_key(spec: list[tuple[str, str]]) -> str:
+    text = json.dumps([FORMAT_VERSION, spec], ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_dir: str | os.PathLike, spec: list[tuple[str, str]]) -> str:
+    return os.path.join(cache_dir, spec_key(spec) + ".lexer")
+
+
+def store(
+    cache_dir: str | os.PathLike,
+    spec: list[tuple[str, str]],
+    table: CompiledDFA,
+) -> None:
+    """Writes the compiled lexer of `spec` to the cache, atomically."""
+    payload = table.to_bytes()
+    header = _HEADER.pack(
+        _MAGIC, FORMAT_VERSION, sys.byteorder[0].encode(), zlib.crc32(payload)
+    )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, spec)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + payload)
+    os.replace(tmp_path, path)
+
+
+def load(
+    cache_dir: str | os.PathLike, spec: list[tuple[str, str]]
+) -> CompiledDFA | None:
+    """Reads the compiled lexer of `spec`, None if it is missing or unusable."""
+    try:
+        with open(cache_path(cache_dir, spec), "rb") as f:
+            data = memoryview(f.read())
+    except OSError:
+        return None
+
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, byteorder, crc = _HEADER.unpack_from(data)
+    if (
+        magic != _MAGIC
+        or version != FORMAT_VERSION
+        or byteorder != sys.byteorder[0].encode()
+    ):
+        return None
+    payload = data[_HEADER.size :]
+    if zlib.crc32(payload) != crc:
+        return None
+
+    try:
+        table = CompiledDFA.from_bytes(payload)
+    except ValueError:
+        return None
+    if any(rule >= len(spec) for rule in table.accept):
+        return None
+
+    return table
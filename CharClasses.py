@@ -0,0 +1,49 @@
+from bisect import bisect_right
+
+
+class CharClasses(dict[str, int]):
+    """char -> column lookup over sorted code point intervals.
+
+    `bounds[i]` is the first code point of the i-th interval, which runs up
+    to the next bound and whose characters are in `columns[i]`; the first
+    bound is always 0.  A character is looked up by binary search the first
+    time it is seen and then kept in the dict itself, so the lex loop only
+    ever does `classes[c]`, whatever the size of the ranges in the spec.
+    """
+
+    def __init__(self, bounds: list[int], columns: list[int]) -> None:
+        super().__init__()
+        self.bounds = bounds
+        self.columns = columns
+        for b in range(0x80):
+            self[chr(b)] = self.column(b)
+
+    def __missing__(self, c: str) -> int:
+        column = self[c] = self.column(ord(c))
+        return column
+
+    def column(self, code_point: int) -> int:
+        return self.columns[bisect_right(self.bounds, code_point) - 1]
+
+    @staticmethod
+    def from_intervals(intervals: list[tuple[int, int, int]]) -> "CharClasses":
+        """Builds the lookup from sorted disjoint inclusive (low, high, column)
+        intervals; code points outside all of them go to column 0."""
+        bounds: list[int] = []
+        columns: list[int] = []
+
+        def push(bound: int, column: int) -> None:
+            if bounds and bounds[-1] == bound:
+                columns[-1] = column
+                if len(columns) > 1 and columns[-2] == column:
+                    bounds.pop()
+                    columns.pop()
+            elif not columns or columns[-1] != column:
+                bounds.append(bound)
+                columns.append(column)
+
+        push(0, 0)
+        for low, high, column in intervals:
+            push(low, column)
+            push(high + 1, 0)
+        return CharClasses(bounds, columns)
@@ -0,0 +1,143 @@
+from .CompiledDFA import CompiledDFA
+from .Lexer import Lexer
+
+# action of a state where the scan goes on without a match, and of one where
+# it stops without a match; accepting states have the index of their rule as
+# action, or _HALT - rule if the scan stops there (see CompiledDFA.halt)
+_CONTINUE = -1
+_SINK = -2
+_HALT = -3
+
+_TEMPLATE = '''\
+"""Lexer generated by Codegen.generate_module, do not edit."""
+
+from bisect import bisect_right
+
+# spec:
+{spec}
+
+NAMES = {names}
+
+# rules whose tokens are consumed but not returned
+SKIP = {skip}
+
+# code points from BOUNDS[i] up to the next bound are in column COLUMNS[i]
+BOUNDS = {bounds}
+COLUMNS = {columns}
+
+
+class _Classes(dict):
+    def __missing__(self, c):
+        column = self[c] = COLUMNS[bisect_right(BOUNDS, ord(c)) - 1]
+        return column
+
+
+# character -> column, filled in as characters are seen
+CLASSES = _Classes()
+for _b in range(0x80):
+    CLASSES[chr(_b)]
+
+# ROWS[state][column] is the next state
+ROWS = (
+{rows}
+)
+
+# rule index of accepting states, {cont} to go on, {sink} to stop, and
+# {halt} - rule for accepting states where the scan stops
+ACTIONS = {actions}
+
+# a lexeme matched by one of KEYWORD_RULES that is in KEYWORDS belongs to
+# the keyword rule instead
+KEYWORDS = {keywords}
+KEYWORD_RULES = {keyword_rules}
+
+
+def lex(word: str) -> list[tuple[str, str]]:
+    classes = CLASSES
+    rows = ROWS
+    actions = ACTIONS
+    keywords = KEYWORDS
+    keyword_rules = KEYWORD_RULES
+    names = NAMES
+    skip = SKIP
+    tokens = []
+    append = tokens.append
+    n = len(word)
+    start = 0
+    while start < n:
+        row = rows[{q0}]
+        rule = -1
+        match_end = start
+        stop = n
+        pos = start
+        while pos < n:
+            state = row[classes[word[pos]]]
+            pos += 1
+            action = actions[state]
+            if action >= 0:
+                rule = action
+                match_end = pos
+            elif action != {cont}:
+                if action != {sink}:
+                    rule = {halt} - action
+                    match_end = pos
+                stop = pos - 1
+                break
+            row = rows[state]
+
+        if rule < 0 or match_end == start:
+            line = word.count("\\n", 0, stop)
+            line_idx = word.rfind("\\n", 0, stop) + 1
+            if stop < n:
+                match = f"No viable alternative at character {{stop - line_idx}}, line {{line}}"
+            else:
+                match = f"No viable alternative at character EOF, line {{line}}"
+            return [("", match)]
+
+        if rule in keyword_rules:
+            rule = keywords.get(word[start:match_end], rule)
+        if not skip[rule]:
+            append((names[rule], word[start:match_end]))
+        start = match_end
+    return tokens
+'''
+
+
+def generate_module(lexer: Lexer) -> str:
+    """Python source of a standalone module with a `lex` function for `lexer`.
+
+    The generated `lex` returns the same result as Lexer.lex, but runs as one
+    function over tuple literals, without method calls per character or per
+    token, and the module needs no compile step when it is imported.
+    """
+    table = getattr(lexer.table, "table", lexer.table)
+    if not isinstance(table, CompiledDFA):
+        raise ValueError("only lexers with a compiled table can be generated")
+
+    n = table.n_classes
+    rows = ",\n".join(
+        f"    {tuple(table.d[state * n : (state + 1) * n])!r}"
+        for state in range(table.n_states)
+    )
+    actions = tuple(
+        (_HALT - rule if halt else rule)
+        if rule >= 0
+        else (_SINK if halt else _CONTINUE)
+        for rule, halt in zip(table.accept, table.halt)
+    )
+
+    return _TEMPLATE.format(
+        spec="\n".join(f"#     {name!r}: {regex!r}" for name, regex in lexer.spec),
+        names=repr(tuple(name for name, _ in lexer.spec)),
+        skip=repr(tuple(lexer.skip)),
+        bounds=repr(tuple(table.classes.bounds)),
+        columns=repr(tuple(table.classes.columns)),
+        rows=rows,
+        actions=repr(actions),
+        keywords=repr(dict(sorted(table.keywords.items()))),
+        keyword_rules=repr(frozenset(sorted(table.keyword_rules))),
+        cont=_CONTINUE,
+        sink=_SINK,
+        halt=_HALT,
+        q0=table.q0,
+    )
@@ -0,0 +1,509 @@
+from .CharClasses import CharClasses
+from .DFA import DFA
+
+from array import array
+from collections.abc import Callable
+from dataclasses import dataclass, field
+import struct
+
+# n_classes, n_states, q0, number of class intervals, number of keywords
+_HEADER = struct.Struct("<IIIII")
+# rule and UTF-8 length of a keyword
+_KEYWORD = struct.Struct("<iI")
+
+# scan bound of states from which an accepting state is reachable through a cycle
+UNBOUNDED = 1 << 62
+
+
+@dataclass
+class CompiledDFA:
+    # character -> column; column 0 is reserved for characters outside the alphabet
+    classes: CharClasses
+    n_classes: int
+    n_states: int
+    q0: int
+    # flat transition table, indexed by state * n_classes + column
+    d: array
+    # index of the spec rule that wins in each state, -1 if the state is not accepting
+    accept: list[int]
+    # states from which no accepting state can be reached in one or more
+    # steps, see scan_bounds; a scan that gets there can stop
+    halt: list[bool]
+    # literal -> rule, for the keyword rules left out of the table (see
+    # Lexer.compile); a match of one of `keyword_rules` whose lexeme is such
+    # a literal belongs to the keyword rule instead
+    keywords: dict[str, int] = field(default_factory=dict)
+    keyword_rules: set[int] = field(default_factory=set)
+
+    def step(self, state: int, symbol: str) -> int:
+        return self.d[state * self.n_classes + self.classes[symbol]]
+
+    def longest_match(
+        self, word: str, start: int, end: int | None = None
+    ) -> tuple[int, int, int]:
+        """Runs the table from q0 at `start` and returns (rule, match_end, stop).
+
+        `rule` is -1 if no prefix was accepted.  `stop` is the index of the
+        last character read if the scan stopped because no longer match was
+        possible, or `end` if the input ran out first.
+        """
+        if end is None:
+            end = len(word)
+        classes = self.classes
+        d = self.d
+        n = self.n_classes
+        accept = self.accept
+        halt = self.halt
+
+        state = self.q0
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        while pos < end:
+            state = d[state * n + classes[word[pos]]]
+            pos += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+            if halt[state]:
+                stop = pos - 1
+                break
+
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop
+
+    def resume_match(
+        self,
+        word: str,
+        start: int,
+        scan: tuple[int, int, int, int] | None,
+        final: bool,
+    ) -> tuple[int, int, int, tuple[int, int, int, int]]:
+        """longest_match from `start` to the end of `word`, carried on from
+        `scan` instead of from q0.
+
+        Returns (rule, match_end, stop, scan).  If the input ran out and
+        `word` is not `final`, the match may still grow: the returned scan,
+        (state, characters read, rule, characters matched), resumes it once
+        more text has been appended to `word`.  Keywords are only looked up
+        when the match cannot grow.
+        """
+        if scan is None:
+            state, read, rule, matched = self.q0, 0, -1, 0
+        else:
+            state, read, rule, matched = scan
+        classes = self.classes
+        d = self.d
+        n = self.n_classes
+        accept = self.accept
+        halt = self.halt
+
+        end = len(word)
+        match_end = start + matched
+        pos = start + read
+        stop = end
+        while pos < end:
+            state = d[state * n + classes[word[pos]]]
+            pos += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+            if halt[state]:
+                stop = pos - 1
+                break
+
+        scan = state, pos - start, rule, match_end - start
+        if (final or stop < end) and rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop, scan
+
+    def longest_match_linear(
+        self, word: str, start: int, end: int | None, failed: dict[int, int]
+    ) -> tuple[int, int, int, int]:
+        """Same as longest_match, memoizing (state, position) pairs that fail.
+
+        This is Reps' maximal munch: every pair visited after the last
+        accepting position is recorded in `failed` together with the index
+        where its scan stopped.  A later scan that reaches a recorded pair
+        stops right away, so lexing a whole input with one `failed` dict
+        reads each character a bounded number of times.
+
+        Returns (rule, match_end, stop, read), where `read` is one past the
+        last character actually read: `stop` may come from `failed` and lie
+        further on.
+        """
+        if end is None:
+            end = len(word)
+        classes = self.classes
+        d = self.d
+        n = self.n_classes
+        n_states = self.n_states
+        accept = self.accept
+        halt = self.halt
+
+        state = self.q0
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        visited = []
+        while pos < end:
+            state = d[state * n + classes[word[pos]]]
+            pos += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+                visited.clear()
+            if halt[state]:
+                stop = pos - 1
+                break
+            if accept[state] < 0:
+                key = pos * n_states + state
+                if key in failed:
+                    stop = failed[key]
+                    break
+                visited.append(key)
+
+        for key in visited:
+            failed[key] = stop
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop, pos
+
+    def byte_columns(self) -> list[int]:
+        """Column of every byte value, -1 for the lead bytes of non-ASCII text."""
+        columns = [self.classes[chr(b)] for b in range(0x80)]
+        return columns + [-1] * 0x80
+
+    def longest_match_bytes(
+        self, data: bytes | memoryview, start: int, end: int, byte_columns: list[int]
+    ) -> tuple[int, int, int]:
+        """longest_match over UTF-8 encoded bytes, with byte offsets.
+
+        ASCII bytes are looked up directly in `byte_columns`; a non-ASCII
+        character is decoded only to find its column.  Malformed sequences
+        lead to the dead state.
+        """
+        classes = self.classes
+        d = self.d
+        n = self.n_classes
+        accept = self.accept
+        halt = self.halt
+
+        state = self.q0
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        while pos < end:
+            b = data[pos]
+            column = byte_columns[b]
+            if column >= 0:
+                length = 1
+            else:
+                length = 2 if b < 0xE0 else 3 if b < 0xF0 else 4
+                try:
+                    column = classes[str(data[pos : pos + length], "utf-8")]
+                except UnicodeDecodeError:
+                    length = 1
+                    column = 0
+            state = d[state * n + column]
+            pos += length
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+            if halt[state]:
+                stop = pos - length
+                break
+
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(str(data[start:match_end], "utf-8"), rule)
+        return rule, match_end, stop
+
+    def rule_of(self, word: str) -> int:
+        """The rule the table accepts all of `word` with, -1 if none."""
+        state = self.q0
+        for c in word:
+            state = self.step(state, c)
+        return self.accept[state]
+
+    def to_bytes(self) -> bytes:
+        """Packs the table, see from_bytes.  Arrays use the native byte order."""
+        bounds = array("I", self.classes.bounds)
+        columns = array("I", self.classes.columns)
+        keywords = []
+        for literal, rule in self.keywords.items():
+            encoded = literal.encode("utf-8")
+            keywords.append(_KEYWORD.pack(rule, len(encoded)) + encoded)
+        return b"".join(
+            (
+                _HEADER.pack(
+                    self.n_classes,
+                    self.n_states,
+                    self.q0,
+                    len(bounds),
+                    len(self.keywords),
+                ),
+                bounds.tobytes(),
+                columns.tobytes(),
+                self.d.tobytes(),
+                array("i", self.accept).tobytes(),
+                bytes(self.halt),
+                *keywords,
+            )
+        )
+
+    @staticmethod
+    def from_bytes(data: bytes | memoryview) -> "CompiledDFA":
+        """Unpacks a table written by to_bytes, raises ValueError if malformed."""
+        data = memoryview(data)
+        if len(data) < _HEADER.size:
+            raise ValueError("truncated table header")
+        n_classes, n_states, q0, n_bounds, n_keywords = _HEADER.unpack_from(data)
+
+        def take(typecode: str, count: int) -> array:
+            nonlocal offset
+            values = array(typecode)
+            size = values.itemsize * count
+            if offset + size > len(data):
+                raise ValueError("truncated table")
+            values.frombytes(data[offset : offset + size])
+            offset += size
+            return values
+
+        offset = _HEADER.size
+        bounds = take("I", n_bounds)
+        columns = take("I", n_bounds)
+        d = take("i", n_states * n_classes)
+        accept = take("i", n_states)
+        halt = take("B", n_states)
+        keywords = {}
+        for _ in range(n_keywords):
+            if offset + _KEYWORD.size > len(data):
+                raise ValueError("truncated table")
+            rule, size = _KEYWORD.unpack_from(data, offset)
+            offset += _KEYWORD.size
+            if offset + size > len(data):
+                raise ValueError("truncated table")
+            keywords[str(data[offset : offset + size], "utf-8")] = rule
+            offset += size
+        if offset != len(data):
+            raise ValueError("trailing data after table")
+        if q0 >= n_states or any(not 0 <= state < n_states for state in d):
+            raise ValueError("state out of range")
+        if any(column >= n_classes for column in columns):
+            raise ValueError("column out of range")
+        if not bounds or bounds[0] != 0 or any(
+            low >= high for low, high in zip(bounds, bounds[1:])
+        ):
+            raise ValueError("class bounds not sorted")
+
+        table = CompiledDFA(
+            CharClasses(bounds.tolist(), columns.tolist()),
+            n_classes,
+            n_states,
+            q0,
+            d,
+            accept.tolist(),
+            [bool(flag) for flag in halt],
+            keywords,
+        )
+        table.keyword_rules = {table.rule_of(literal) for literal in keywords}
+        if -1 in table.keyword_rules:
+            raise ValueError("keyword not accepted by the table")
+        return table
+
+    def minimize(self) -> "CompiledDFA":
+        """Merges equivalent states with Hopcroft's partition refinement.
+
+        The initial partition groups states by the rule that wins in them,
+        not just by accept/reject, so the first-rule-wins choice is kept.
+        """
+        n = self.n_classes
+        d = self.d
+
+        inverse: list[list[list[int]]] = [
+            [[] for _ in range(self.n_states)] for _ in range(n)
+        ]
+        for state in range(self.n_states):
+            row = state * n
+            for column in range(n):
+                inverse[column][d[row + column]].append(state)
+
+        groups: dict[int, set[int]] = {}
+        for state, rule in enumerate(self.accept):
+            groups.setdefault(rule, set()).add(state)
+        partition = list(groups.values())
+        block_of = [0] * self.n_states
+        for block, states in enumerate(partition):
+            for state in states:
+                block_of[state] = block
+
+        worklist = list(range(len(partition)))
+        in_worklist = set(worklist)
+        while worklist:
+            block = worklist.pop()
+            in_worklist.discard(block)
+            splitter = list(partition[block])
+            for column in range(n):
+                predecessors = set()
+                for state in splitter:
+                    predecessors.update(inverse[column][state])
+
+                touched: dict[int, set[int]] = {}
+                for state in predecessors:
+                    touched.setdefault(block_of[state], set()).add(state)
+
+                for block, inside in touched.items():
+                    outside = partition[block]
+                    if len(inside) == len(outside):
+                        continue
+                    # the states going into the splitter move to a new block
+                    outside -= inside
+                    new_block = len(partition)
+                    partition.append(inside)
+                    for state in inside:
+                        block_of[state] = new_block
+
+                    if block in in_worklist or len(inside) <= len(outside):
+                        worklist.append(new_block)
+                        in_worklist.add(new_block)
+                    else:
+                        worklist.append(block)
+                        in_worklist.add(block)
+
+        # renumber the blocks breadth first so that q0 stays 0
+        numbering = {block_of[self.q0]: 0}
+        order = [block_of[self.q0]]
+        i = 0
+        while i < len(order):
+            row = next(iter(partition[order[i]])) * n
+            for column in range(n):
+                block = block_of[d[row + column]]
+                if block not in numbering:
+                    numbering[block] = len(order)
+                    order.append(block)
+            i += 1
+
+        n_states = len(order)
+        new_d = array("i", [0]) * (n_states * n)
+        accept = [-1] * n_states
+        for block in order:
+            representative = next(iter(partition[block]))
+            idx = numbering[block]
+            row = representative * n
+            for column in range(n):
+                new_d[idx * n + column] = numbering[block_of[d[row + column]]]
+            accept[idx] = self.accept[representative]
+
+        halt = [bound <= 0 for bound in scan_bounds(new_d, n, accept)]
+        return CompiledDFA(self.classes, n, n_states, 0, new_d, accept, halt)
+
+    def scan_bounds(self) -> list[int]:
+        """See scan_bounds."""
+        return scan_bounds(self.d, self.n_classes, self.accept)
+
+
+def scan_bounds(d: array, n_classes: int, accept: list[int]) -> list[int]:
+    """How many more characters a match can grow by from each state.
+
+    The bound of a state is the length of the longest path from it to an
+    accepting state: -1 if there is none, so the state is dead, 0 for an
+    accepting state that every character leaves for dead states, and
+    UNBOUNDED if the path can go through a cycle.
+    """
+    n_states = len(accept)
+    predecessors: list[list[int]] = [[] for _ in range(n_states)]
+    for state in range(n_states):
+        for next_state in d[state * n_classes : (state + 1) * n_classes]:
+            predecessors[next_state].append(state)
+
+    # states that reach an accepting state, walking back from all of them
+    live = [rule >= 0 for rule in accept]
+    stack = [state for state in range(n_states) if live[state]]
+    while stack:
+        for state in predecessors[stack.pop()]:
+            if not live[state]:
+                live[state] = True
+                stack.append(state)
+
+    # longest paths, settling a state once all its live successors are;
+    # states on or before a live cycle are never settled
+    bounds = [-1] * n_states
+    best = [0] * n_states
+    pending = [0] * n_states
+    for state in range(n_states):
+        if live[state]:
+            row = d[state * n_classes : (state + 1) * n_classes]
+            pending[state] = sum(live[next_state] for next_state in row)
+    stack = [state for state in range(n_states) if live[state] and not pending[state]]
+    while stack:
+        state = stack.pop()
+        bounds[state] = best[state]
+        for previous in predecessors[state]:
+            if live[previous]:
+                best[previous] = max(best[previous], best[state] + 1)
+                pending[previous] -= 1
+                if not pending[previous]:
+                    stack.append(previous)
+    for state in range(n_states):
+        if live[state] and pending[state]:
+            bounds[state] = UNBOUNDED
+    return bounds
+
+
+def compile_dfa[
+    STATE
+](
+    dfa: DFA[STATE],
+    tag: Callable[[STATE], int],
+    symbol_classes: list[tuple[int, int, str]] | None = None,
+) -> CompiledDFA:
+    """Compiles `dfa` into a dense table, `tag` gives the rule of a final state.
+
+    If the alphabet of `dfa` was compressed, `symbol_classes` holds the
+    (low, high, representative) code point intervals of NFA.symbol_classes.
+    """
+    # the alphabet is sorted so that the numbering does not depend on set order
+    symbols = sorted(dfa.S)
+    columns = {symbol: i + 1 for i, symbol in enumerate(symbols)}
+    n_classes = len(symbols) + 1
+    if symbol_classes is None:
+        symbol_classes = [(ord(symbol), ord(symbol), symbol) for symbol in symbols]
+    classes = CharClasses.from_intervals(
+        [(low, high, columns[symbol]) for low, high, symbol in symbol_classes]
+    )
+
+    # renumber the reachable states breadth first, q0 becomes 0
+    numbering: dict[STATE, int] = {dfa.q0: 0}
+    order: list[STATE] = [dfa.q0]
+    i = 0
+    while i < len(order):
+        state = order[i]
+        for symbol in symbols:
+            next_state = dfa.d.get((state, symbol))
+            if next_state is not None and next_state not in numbering:
+                numbering[next_state] = len(order)
+                order.append(next_state)
+        i += 1
+
+    # missing transitions and column 0 go to an explicit dead state
+    dead = len(order)
+    n_states = dead + 1
+    d = array("i", [dead]) * (n_states * n_classes)
+    for state in order:
+        row = numbering[state] * n_classes
+        for symbol in symbols:
+            next_state = dfa.d.get((state, symbol))
+            if next_state is not None:
+                d[row + columns[symbol]] = numbering[next_state]
+
+    accept = [-1] * n_states
+    for state in order:
+        if state in dfa.F:
+            accept[numbering[state]] = tag(state)
+
+    halt = [bound <= 0 for bound in scan_bounds(d, n_classes, accept)]
+    return CompiledDFA(classes, n_classes, n_states, 0, d, accept, halt)
@@ -0,0 +1,158 @@
+from .DFA import DFA
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .Regex import Regex
+
+
+class Followpos:
+    """Positions of a set of regexes and the followpos relation between them.
+
+    Every character or class leaf of a regex is one position, labeled with
+    its inclusive code point ranges, and every rule gets one end position
+    that is labeled with its index instead.  Sets of positions are int
+    bitmasks.  Regex nodes add their positions through `positions`, the way
+    they add NFA states to an NFABuilder.
+    """
+
+    def __init__(self) -> None:
+        self.labels: list[list[tuple[int, int]]] = []
+        self.follow: list[int] = []
+        # end position -> index of its rule
+        self.ends: dict[int, int] = {}
+
+    def new_position(self, ranges: list[tuple[int, int]]) -> int:
+        self.labels.append(ranges)
+        self.follow.append(0)
+        return len(self.labels) - 1
+
+    def new_end(self, rule: int) -> int:
+        position = self.new_position([])
+        self.ends[position] = rule
+        return position
+
+    def add_follow(self, last: int, first: int) -> None:
+        """Every position in `first` may follow every position in `last`."""
+        follow = self.follow
+        while last:
+            low = last & -last
+            last ^= low
+            follow[low.bit_length() - 1] |= first
+
+    def read(self, q0: int, words: list[str]) -> list[int]:
+        """The position sets reached from `q0` after reading each of `words`."""
+        labels = self.labels
+        follow = self.follow
+        results = []
+        for word in words:
+            state = q0
+            for c in word:
+                code = ord(c)
+                next_state = 0
+                while state:
+                    low = state & -state
+                    state ^= low
+                    position = low.bit_length() - 1
+                    for low_code, high_code in labels[position]:
+                        if low_code <= code <= high_code:
+                            next_state |= follow[position]
+                            break
+                state = next_state
+                if not state:
+                    break
+            results.append(state)
+        return results
+
+    def symbol_classes(self) -> tuple[list[tuple[int, int, str]], list[list[str]]]:
+        """Equivalence classes of code points, like NFA.symbol_classes.
+
+        Returns the (low, high, representative) intervals and, for every
+        position, the representatives of the classes its label covers.
+        """
+        bounds = sorted(
+            {low for ranges in self.labels for low, _ in ranges}
+            | {high + 1 for ranges in self.labels for _, high in ranges}
+        )
+        # the positions whose label covers each elementary interval
+        covered = [0] * len(bounds)
+        for position, ranges in enumerate(self.labels):
+            for low, high in ranges:
+                for i in range(bisect_left(bounds, low), bisect_left(bounds, high + 1)):
+                    covered[i] |= 1 << position
+
+        representatives: dict[int, str] = {}
+        classes = []
+        reps: list[list[str]] = [[] for _ in self.labels]
+        for i, mask in enumerate(covered):
+            if not mask:
+                continue
+            representative = representatives.get(mask)
+            if representative is None:
+                representative = representatives[mask] = chr(bounds[i])
+                while mask:
+                    low = mask & -mask
+                    mask ^= low
+                    reps[low.bit_length() - 1].append(representative)
+            classes.append((bounds[i], bounds[i + 1] - 1, representative))
+
+        return classes, reps
+
+
+def add_positions(regexes: list["Regex"]) -> tuple[Followpos, int]:
+    """The positions of `regexes`, each ending in the end position of its
+    index, and the set of positions a match can start with."""
+    builder = Followpos()
+    q0 = 0
+    for rule, regex in enumerate(regexes):
+        nullable, first, last = regex.positions(builder)
+        end = 1 << builder.new_end(rule)
+        builder.add_follow(last, end)
+        q0 |= first | (end if nullable else 0)
+    return builder, q0
+
+
+def followpos_dfa(
+    regexes: list["Regex"],
+) -> tuple[DFA[int], Followpos, list[tuple[int, int, str]]]:
+    """Builds the DFA of the union of `regexes` without an NFA in between.
+
+    DFA states are bitmasks of positions, q0 is the union of the first
+    positions of all rules and a state is final when it holds the end
+    position of some rule.  Returns the DFA over the class representatives,
+    the Followpos it was built from and the classes for compile_dfa.
+    """
+    builder, q0 = add_positions(regexes)
+    classes, reps = builder.symbol_classes()
+    follow = builder.follow
+    end_mask = 0
+    for position in builder.ends:
+        end_mask |= 1 << position
+
+    K = {q0}
+    d: dict[tuple[int, str], int] = {}
+    F = set()
+    stack = [q0]
+    while stack:
+        state = stack.pop()
+        if state & end_mask:
+            F.add(state)
+        moves: dict[str, int] = {}
+        mask = state
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            position = low.bit_length() - 1
+            for representative in reps[position]:
+                moves[representative] = moves.get(representative, 0) | follow[position]
+        for representative, next_state in moves.items():
+            if not next_state:
+                continue
+            d[(state, representative)] = next_state
+            if next_state not in K:
+                K.add(next_state)
+                stack.append(next_state)
+
+    S = {representative for _, _, representative in classes}
+    return DFA(S=S, K=K, q0=q0, d=d, F=F), builder, classes
@@ -0,0 +1,79 @@
+from .NFA import NFA
+from .Regex import Regex, parse_regex
+
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """In-process LRU cache of parsed regexes and their Thompson NFAs.
+
+    Entries are keyed by regex text, so lexers whose specs share rules parse
+    and build each shared rule once; unite_nfas offsets the cached NFAs into
+    every lexer without changing them.  Cached Regex and NFA objects are
+    shared and must be treated as read only.  At most `max_size` regexes are
+    kept, the least recently used one is dropped first.  One cache can be
+    used by lexers built on several threads at once.
+
+    `hits` and `misses` count the regexes and NFAs that were found in the
+    cache and the ones that had to be built.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # regex text -> [parsed regex, Thompson NFA with ranges or None]
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def regex(self, text: str) -> Regex:
+        """parse_regex(text), parsed only if it is not cached."""
+        entry, hit = self._entry(text)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[0]
+
+    def nfa(self, text: str) -> NFA[int]:
+        """parse_regex(text).thompson(ranges=True), built only once."""
+        entry, _ = self._entry(text)
+        nfa = entry[1]
+        if nfa is None:
+            # built outside the lock, a racing thread at worst builds it twice
+            nfa = entry[0].thompson(ranges=True)
+        with self._lock:
+            if entry[1] is None:
+                entry[1] = nfa
+                self.misses += 1
+            else:
+                nfa = entry[1]
+                self.hits += 1
+        return nfa
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _entry(self, text: str) -> tuple[list, bool]:
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is not None:
+                self._entries.move_to_end(text)
+                return entry, True
+
+        regex = parse_regex(text)
+        with self._lock:
+            # of two threads that parsed the same text, the first one wins
+            entry = self._entries.setdefault(text, [regex, None])
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry, False
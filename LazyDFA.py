@@ -0,0 +1,474 @@
+from .CharClasses import CharClasses
+from .NFA import NFA, EPSILON
+
+
+class LazyDFA:
+    """DFA whose states are built from NFA bitmasks while lexing.
+
+    It answers the same longest_match queries as CompiledDFA, but a state is
+    only created the first time a scan reaches it, and at most `max_states`
+    are kept.  When the cache is full it is flushed; if that happens before
+    the cached states have been used for 10 characters each on average, the
+    cache is thrashing and the DFA falls back to stepping the NFA bitmasks
+    directly without caching anything.  After as many characters as one
+    such window, the cache is tried again.
+    """
+
+    def __init__(
+        self,
+        nfa: NFA[int],
+        symbol_classes: list[tuple[int, int, str]],
+        nfa_final_states_dict: dict[int, int],
+        n_rules: int,
+        max_states: int = 10000,
+    ) -> None:
+        states, closures = nfa.closure_masks()
+        index = {state: i for i, state in enumerate(states)}
+
+        symbols = sorted(nfa.S)
+        columns = {symbol: i + 1 for i, symbol in enumerate(symbols)}
+        self.classes = CharClasses.from_intervals(
+            [(low, high, columns[symbol]) for low, high, symbol in symbol_classes]
+        )
+        self.n_classes = len(symbols) + 1
+
+        # for each NFA state, the closure reached on each column
+        self.moves: list[dict[int, int]] = [{} for _ in states]
+        for (state, symbol), next_states in nfa.d.items():
+            if symbol == EPSILON:
+                continue
+            target = 0
+            for next_state in next_states:
+                target |= closures[next_state]
+            self.moves[index[state]][columns[symbol]] = target
+
+        self.rule_masks = [0] * n_rules
+        for state, rule in nfa_final_states_dict.items():
+            self.rule_masks[rule] |= 1 << index[state]
+        final_mask = 0
+        for mask in self.rule_masks:
+            final_mask |= mask
+
+        # NFA states that can still reach a final state; the others are
+        # dropped from every subset so that dead subsets all become 0
+        predecessors: list[list[int]] = [[] for _ in states]
+        for (state, _), next_states in nfa.d.items():
+            for next_state in next_states:
+                predecessors[index[next_state]].append(index[state])
+        live = final_mask
+        stack = [i for i in range(len(states)) if final_mask >> i & 1]
+        while stack:
+            for i in predecessors[stack.pop()]:
+                if not live >> i & 1:
+                    live |= 1 << i
+                    stack.append(i)
+        self.live = live
+
+        # NFA states with a move to a live state; a subset without any of
+        # them cannot be extended into a longer match, see CompiledDFA.halt
+        extendable = 0
+        for i, state_moves in enumerate(self.moves):
+            if any(target & live for target in state_moves.values()):
+                extendable |= 1 << i
+        self.extendable = extendable
+
+        self.q0 = closures[nfa.q0] & live
+        # see CompiledDFA.keywords
+        self.keywords: dict[str, int] = {}
+        self.keyword_rules: set[int] = set()
+        self.max_states = max(max_states, 3)
+        # characters a full cache has to serve before a flush is not thrashing
+        self.window = 10 * self.max_states
+        self.thrashing = False
+        self.flushes = 0
+        self.generation = 0
+        self.scanned = 0
+
+        # cached states: id -> mask, mask -> id, transition rows, rules and
+        # halt flags
+        self.masks: list[int] = []
+        self.ids: dict[int, int] = {}
+        self.rows: list[list[int]] = []
+        self.accept: list[int] = []
+        self.halt: list[bool] = []
+        self._flush()
+
+    def move(self, mask: int, column: int) -> int:
+        moves = self.moves
+        next_mask = 0
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            next_mask |= moves[low.bit_length() - 1].get(column, 0)
+        return next_mask & self.live
+
+    def rule(self, mask: int) -> int:
+        for index, rule_mask in enumerate(self.rule_masks):
+            if mask & rule_mask:
+                return index
+        return -1
+
+    def _flush(self) -> None:
+        if self.masks and self.scanned < self.window:
+            self.thrashing = True
+        self.flushes += len(self.masks) > 0
+        self.generation += 1
+        self.scanned = 0
+        self.masks.clear()
+        self.ids.clear()
+        self.rows.clear()
+        self.accept.clear()
+        self.halt.clear()
+        # the dead state is always 0 and q0 is always 1
+        self._state(0)
+        self._state(self.q0)
+
+    def _state(self, mask: int) -> int:
+        state = self.ids.get(mask)
+        if state is None:
+            if len(self.masks) >= self.max_states:
+                self._flush()
+            state = len(self.masks)
+            self.ids[mask] = state
+            self.masks.append(mask)
+            self.rows.append([-1] * self.n_classes)
+            self.accept.append(self.rule(mask))
+            self.halt.append(not mask & self.extendable)
+        return state
+
+    def step(self, state: int, column: int) -> int:
+        """Next state id, building it if needed; ids held from before are
+        invalid if this flushed the cache."""
+        next_state = self.rows[state][column]
+        if next_state < 0:
+            generation = self.generation
+            next_state = self._state(self.move(self.masks[state], column))
+            if generation == self.generation:
+                self.rows[state][column] = next_state
+        return next_state
+
+    def _bypass(self) -> bool:
+        """Whether scans step the NFA without the cache; a thrashing cache is
+        used again once the uncached scans have read a window of characters."""
+        if self.thrashing and self.scanned >= self.window:
+            self.thrashing = False
+            self.scanned = 0
+        return self.thrashing
+
+    def longest_match(
+        self, word: str, start: int, end: int | None = None
+    ) -> tuple[int, int, int]:
+        if end is None:
+            end = len(word)
+        if self._bypass():
+            rule, match_end, stop = self._simulate(word, end, self.q0, start, -1, start)
+        else:
+            rule, match_end, stop = self._scan(word, start, end)
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop
+
+    def _scan(self, word: str, start: int, end: int) -> tuple[int, int, int]:
+        classes = self.classes
+        rows = self.rows
+        accept = self.accept
+        halt = self.halt
+
+        state = 1
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        # characters scanned are only added up on cache misses and at the end
+        counted = start
+        while pos < end:
+            column = classes[word[pos]]
+            next_state = rows[state][column]
+            if next_state < 0:
+                self.scanned += pos - counted
+                counted = pos
+                if self.thrashing:
+                    # carry on from the current subset without the cache
+                    mask = self.masks[state]
+                    return self._simulate(word, end, mask, pos, rule, match_end)
+                next_state = self.step(state, column)
+            state = next_state
+            pos += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+            if halt[state]:
+                stop = pos - 1
+                break
+
+        self.scanned += pos - counted
+        return rule, match_end, stop
+
+    def _simulate(
+        self,
+        word: str,
+        end: int,
+        mask: int,
+        pos: int,
+        rule: int,
+        match_end: int,
+    ) -> tuple[int, int, int]:
+        """Steps the NFA bitmask from `mask` at `pos` without caching states."""
+        classes = self.classes
+        extendable = self.extendable
+
+        start = pos
+        while pos < end:
+            mask = self.move(mask, classes[word[pos]])
+            pos += 1
+            accepted = self.rule(mask)
+            if accepted >= 0:
+                rule = accepted
+                match_end = pos
+            if not mask & extendable:
+                self.scanned += pos - start
+                return rule, match_end, pos - 1
+
+        self.scanned += pos - start
+        return rule, match_end, pos
+
+    def resume_match(
+        self,
+        word: str,
+        start: int,
+        scan: tuple[int, int, int, int] | None,
+        final: bool,
+    ) -> tuple[int, int, int, tuple[int, int, int, int]]:
+        """See CompiledDFA.resume_match.
+
+        The scan keeps its subset mask rather than its state id, since ids
+        change when the cache is flushed.
+        """
+        if scan is None:
+            mask, read, rule, matched = self.q0, 0, -1, 0
+        else:
+            mask, read, rule, matched = scan
+        classes = self.classes
+
+        end = len(word)
+        match_end = start + matched
+        pos = start + read
+        stop = end
+        if self._bypass():
+            extendable = self.extendable
+            while pos < end:
+                mask = self.move(mask, classes[word[pos]])
+                pos += 1
+                accepted = self.rule(mask)
+                if accepted >= 0:
+                    rule = accepted
+                    match_end = pos
+                if not mask & extendable:
+                    stop = pos - 1
+                    break
+        else:
+            state = self._state(mask)
+            while pos < end:
+                state = self.step(state, classes[word[pos]])
+                pos += 1
+                if self.accept[state] >= 0:
+                    rule = self.accept[state]
+                    match_end = pos
+                if self.halt[state]:
+                    stop = pos - 1
+                    break
+            mask = self.masks[state]
+
+        self.scanned += pos - start - read
+        scan = mask, pos - start, rule, match_end - start
+        if (final or stop < end) and rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop, scan
+
+    def longest_match_linear(
+        self, word: str, start: int, end: int | None, failed: dict
+    ) -> tuple[int, int, int, int]:
+        """See CompiledDFA.longest_match_linear.
+
+        Pairs are keyed by subset mask rather than by state id, since ids
+        change when the cache is flushed.
+        """
+        if end is None:
+            end = len(word)
+        if self._bypass():
+            scan = self._simulate_linear(word, start, end, failed)
+        else:
+            scan = self._scan_linear(word, start, end, failed)
+        rule, match_end, stop, read = scan
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(word[start:match_end], rule)
+        return rule, match_end, stop, read
+
+    def _scan_linear(
+        self, word: str, start: int, end: int, failed: dict
+    ) -> tuple[int, int, int, int]:
+        classes = self.classes
+        rows = self.rows
+        accept = self.accept
+        halt = self.halt
+        masks = self.masks
+
+        state = 1
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        visited = []
+        counted = start
+        while pos < end:
+            column = classes[word[pos]]
+            next_state = rows[state][column]
+            if next_state < 0:
+                self.scanned += pos - counted
+                counted = pos
+                next_state = self.step(state, column)
+            state = next_state
+            pos += 1
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+                visited.clear()
+            if halt[state]:
+                stop = pos - 1
+                break
+            if accept[state] < 0:
+                key = (pos, masks[state])
+                if key in failed:
+                    stop = failed[key]
+                    break
+                visited.append(key)
+
+        self.scanned += pos - counted
+        for key in visited:
+            failed[key] = stop
+        return rule, match_end, stop, pos
+
+    def _simulate_linear(
+        self, word: str, start: int, end: int, failed: dict
+    ) -> tuple[int, int, int, int]:
+        classes = self.classes
+        extendable = self.extendable
+
+        mask = self.q0
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        visited = []
+        while pos < end:
+            mask = self.move(mask, classes[word[pos]])
+            pos += 1
+            accepted = self.rule(mask)
+            if accepted >= 0:
+                rule = accepted
+                match_end = pos
+                visited.clear()
+            if not mask & extendable:
+                stop = pos - 1
+                break
+            if accepted < 0:
+                key = (pos, mask)
+                if key in failed:
+                    stop = failed[key]
+                    break
+                visited.append(key)
+
+        self.scanned += pos - start
+        for key in visited:
+            failed[key] = stop
+        return rule, match_end, stop, pos
+
+    def byte_columns(self) -> list[int]:
+        columns = [self.classes[chr(b)] for b in range(0x80)]
+        return columns + [-1] * 0x80
+
+    def longest_match_bytes(
+        self, data: bytes | memoryview, start: int, end: int, byte_columns: list[int]
+    ) -> tuple[int, int, int]:
+        """See CompiledDFA.longest_match_bytes."""
+        if self._bypass():
+            rule, match_end, stop = self._simulate_bytes(data, start, end, byte_columns)
+        else:
+            rule, match_end, stop = self._scan_bytes(data, start, end, byte_columns)
+        if rule in self.keyword_rules:
+            rule = self.keywords.get(str(data[start:match_end], "utf-8"), rule)
+        return rule, match_end, stop
+
+    def _column(self, data: bytes | memoryview, pos: int) -> tuple[int, int]:
+        """Column and length of the multi-byte character at `pos`."""
+        b = data[pos]
+        length = 2 if b < 0xE0 else 3 if b < 0xF0 else 4
+        try:
+            return self.classes[str(data[pos : pos + length], "utf-8")], length
+        except UnicodeDecodeError:
+            return 0, 1
+
+    def _scan_bytes(
+        self, data: bytes | memoryview, start: int, end: int, byte_columns: list[int]
+    ) -> tuple[int, int, int]:
+        rows = self.rows
+        accept = self.accept
+        halt = self.halt
+
+        state = 1
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        counted = start
+        while pos < end:
+            column = byte_columns[data[pos]]
+            if column >= 0:
+                length = 1
+            else:
+                column, length = self._column(data, pos)
+            next_state = rows[state][column]
+            if next_state < 0:
+                self.scanned += pos - counted
+                counted = pos
+                next_state = self.step(state, column)
+            state = next_state
+            pos += length
+            if accept[state] >= 0:
+                rule = accept[state]
+                match_end = pos
+            if halt[state]:
+                stop = pos - length
+                break
+
+        self.scanned += pos - counted
+        return rule, match_end, stop
+
+    def _simulate_bytes(
+        self, data: bytes | memoryview, start: int, end: int, byte_columns: list[int]
+    ) -> tuple[int, int, int]:
+        extendable = self.extendable
+
+        mask = self.q0
+        rule = -1
+        match_end = start
+        pos = start
+        stop = end
+        while pos < end:
+            column = byte_columns[data[pos]]
+            if column >= 0:
+                length = 1
+            else:
+                column, length = self._column(data, pos)
+            mask = self.move(mask, column)
+            pos += length
+            accepted = self.rule(mask)
+            if accepted >= 0:
+                rule = accepted
+                match_end = pos
+            if not mask & extendable:
+                stop = pos - length
+                break
+
+        self.scanned += pos - start
+        return rule, match_end, stop
@@ -1,99 +1,691 @@
-from .Regex import Regex, parse_regex
-from .DFA import DFA
+from . import Cache
+from .Regex import Regex, literal, parse_regex
+from .CompiledDFA import CompiledDFA, compile_dfa
+from .Followpos import add_positions, followpos_dfa
+from .FragmentCache import FragmentCache
+from .LazyDFA import LazyDFA
+from .LineIndex import LineIndex
+from .Spans import Spans
+from .Stats import InstrumentedTable, LexerStats
+from .TokenStream import TokenBatch, TokenStream
 from .NFA import NFA
 from .NFA import unite_nfas
 
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import TextIO
+
+
+class LexError(Exception):
+    """No rule of the spec matches the input at `position`."""
+
+    def __init__(self, position: int, line: int, column: int, eof: bool) -> None:
+        self.position = position
+        self.line = line
+        self.column = column
+        self.eof = eof
+        if eof:
+            message = f"No viable alternative at character EOF, line {line}"
+        else:
+            message = f"No viable alternative at character {column}, line {line}"
+        super().__init__(message)
+
+
+# the table of lex_parallel, set once in every worker process
+_worker_table: CompiledDFA | LazyDFA | None = None
+
+
+def _init_worker(table: CompiledDFA | LazyDFA) -> None:
+    global _worker_table
+    _worker_table = table
+
+
+def _lex_chunk(text: str, offset: int, chunk_end: int, final: bool) -> array:
+    """Lexes the tokens that start before `chunk_end`, starting in q0.
+
+    `text` is the chunk plus some overlap and starts at `offset` of the
+    input; `final` says whether it runs to the end of the input.  Returns
+    flat (rule, start, end) triples with positions in the input, up to the
+    first token that fails or whose scan runs into the end of `text`
+    before the end of the input, which could still grow.
+    """
+    table = _worker_table
+    triples = array("q")
+    start_index = 0
+    limit = chunk_end - offset
+    while start_index < limit:
+        rule, end_index, stop = table.longest_match(text, start_index)
+        if rule < 0 or end_index == start_index or (stop == len(text) and not final):
+            break
+        triples.extend((rule, offset + start_index, offset + end_index))
+        start_index = end_index
+    return triples
+
+
+def _rule_selector(rules: dict[int, int], n_rules: int) -> Callable[[int], int]:
+    """The tag function of compile_dfa for DFA states that are bitmasks.
+
+    `rules` maps the bit of every final NFA state, or end position, to its
+    rule; of the rules a state accepts, the first one of the spec wins.
+    """
+    rule_masks = [0] * n_rules
+    for bit, rule in rules.items():
+        rule_masks[rule] |= 1 << bit
+
+    def select_mask(dfa_final_state: int) -> int:
+        for index, mask in enumerate(rule_masks):
+            if dfa_final_state & mask:
+                return index
+        return -1
+
+    return select_mask
+
 
 class Lexer:
-    dfa: DFA[frozenset[int]]
-    nfa_final_states_list: list[set[int]]
-    sink_states: set[frozenset[int]]
-    # dictionar care are cheie o stare finala de nfa si valoare indexul expresiei din spec (sau al nfa-ului asociat)
-    nfa_final_states_dict: dict[int, int]
+    table: CompiledDFA | LazyDFA | InstrumentedTable
+    stats: LexerStats | None
     spec: list[tuple[str, str]]
 
-    def __init__(self, spec: list[tuple[str, str]]) -> None:
+    def __init__(
+        self,
+        spec: list[tuple[str, str]],
+        cache_dir: str | os.PathLike | None = None,
+        lazy: bool = False,
+        max_states: int = 10000,
+        stats: bool = False,
+        direct: bool = False,
+        skip: Iterable[str] = (),
+        fragments: FragmentCache | None = None,
+    ) -> None:
+        """Compiles `spec`; `cache_dir` keeps compiled lexers between processes.
+
+        With `lazy` set, DFA states are only built as the input reaches them
+        and at most `max_states` of them are kept, see LazyDFA.  Nothing is
+        compiled up front, so `cache_dir` is not used.
+
+        With `direct` set, the DFA is built straight from the regexes by the
+        followpos construction, without Thompson NFAs; the table is the same.
+        It cannot be combined with `lazy`, which steps an NFA.
+
+        With `stats` set, compile and lexing counters are collected in
+        `self.stats`, see LexerStats.  Otherwise no lexing code is
+        instrumented.
+
+        Tokens of the rules named in `skip`, such as whitespace or comments,
+        are consumed but never built or returned.  lex_spans still returns
+        them, since relex needs every token.
+
+        A `fragments` cache shared by several lexers parses every regex and
+        builds its Thompson NFA only once, see FragmentCache.
+        """
+        if lazy and direct:
+            raise ValueError("a lazy lexer cannot be compiled directly")
+        skip = set(skip)
+        names = {name for name, _ in spec}
+        for name in skip:
+            if name not in names:
+                raise ValueError(f"no rule named {name!r} to skip")
+        self.spec = spec
+        self.skip = [name in skip for name, _ in spec]
+        self.lazy = lazy
+        self.direct = direct
+        self.max_states = max_states
+        self.fragments = fragments
+        self.stats = LexerStats([name for name, _ in spec]) if stats else None
+
+        cached = None
+        if cache_dir is not None and not lazy:
+            t = time.perf_counter()
+            cached = Cache.load(cache_dir, spec)
+            if cached is not None and self.stats is not None:
+                self.stats.compile_seconds["cache_load"] = time.perf_counter() - t
 
-        spec_nfas: list[NFA[int]] = []
-        for _, regex in spec:
-            spec_nfas.append(parse_regex(regex).thompson())
+        if cached is not None:
+            self.table = cached
+        else:
+            self.compile()
+            if cache_dir is not None and not lazy:
+                try:
+                    Cache.store(cache_dir, spec, self.table)
+                except OSError:
+                    # a cache that cannot be written only costs the next startup
+                    pass
 
+        if self.stats is not None:
+            self._instrument(self.stats)
+
+    def _instrument(self, stats: LexerStats) -> None:
+        if isinstance(self.table, CompiledDFA):
+            stats.table_states = self.table.n_states
+        stats.table_columns = self.table.n_classes
+        self.table = InstrumentedTable(self.table, stats)
+        # instance attributes shadow the methods, the class stays untouched
+        for name in (
+            "lex",
+            "lex_stream",
+            "lex_batch",
+            "lex_spans",
+            "relex",
+            "lex_parallel",
+            "count",
+        ):
+            setattr(self, name, stats.timed(getattr(self, name)))
+        for name in ("lex_iter", "lex_file"):
+            setattr(self, name, stats.timed_iter(getattr(self, name)))
+
+    def compile(self) -> None:
+        spec = self.spec
+        stats = self.stats
+        clock = time.perf_counter
+
+        t0 = clock()
+        if self.fragments is not None:
+            regexes = [self.fragments.regex(regex) for _, regex in spec]
+        else:
+            regexes = [parse_regex(regex) for _, regex in spec]
+        t1 = clock()
+        literals: dict[int, str] = {}
+        for i, regex in enumerate(regexes):
+            text = literal(regex)
+            if text is not None:
+                literals[i] = text
+        # the literals are checked against the NFAs of the other rules, which
+        # are built here so that they are timed with the Thompson phase
+        nfas: dict[int, NFA[int]] = {}
+        if not self.direct:
+            for i, regex in enumerate(regexes):
+                if i not in literals:
+                    nfas[i] = self._thompson(i, regex)
+        t2 = clock()
+        kept, keywords, keyword_rules = self._split_keywords(regexes, literals, nfas)
+        t3 = clock()
+        if stats is not None:
+            stats.compile_seconds.update(parse_regex=t1 - t0, keywords=t3 - t2)
+            if not self.direct:
+                stats.compile_seconds["thompson"] = t2 - t1
+
+        if self.direct:
+            self._compile_direct(regexes, kept)
+        else:
+            self._compile_nfa(regexes, kept, nfas)
+        self.table.keywords = keywords
+        self.table.keyword_rules = keyword_rules
+
+    def _split_keywords(
+        self,
+        regexes: list[Regex],
+        literals: dict[int, str],
+        nfas: dict[int, NFA[int]],
+    ) -> tuple[list[int], dict[str, int], set[int]]:
+        """Finds the literal rules that can be left out of the automaton.
+
+        A literal rule can be left out when a rule that is not a literal also
+        matches all of the literal: maximal munch then stops at the same
+        places without it, and only lexemes matched by that other rule have
+        to be looked up among the keywords.  `literals` maps the literal
+        rules to their text and `nfas` holds the Thompson NFAs of the other
+        rules; in direct mode it is empty.  Returns the indices of the rules
+        to compile, the keywords (literal -> rule) and the rules to look
+        them up for.
+        """
+        if not literals:
+            return list(range(len(regexes))), {}, set()
+
+        # of several rules for the same literal, the first one wins
+        first: dict[str, int] = {}
+        for i, text in literals.items():
+            first.setdefault(text, i)
+        texts = list(first)
+
+        # literal -> first rule that is not a literal and matches all of it
+        matched: dict[str, int] = {}
+        others = [i for i in range(len(regexes)) if i not in literals]
+        if self.direct:
+            # the direct path builds no NFA, the literals are read through
+            # the positions of the other rules instead
+            builder, q0 = add_positions([regexes[i] for i in others])
+            for text, state in zip(texts, builder.read(q0, texts)):
+                rules = [
+                    others[rule]
+                    for position, rule in builder.ends.items()
+                    if state >> position & 1
+                ]
+                if rules:
+                    matched[text] = min(rules)
+        else:
+            for i in others:
+                nfa = nfas[i]
+                for text, states in zip(texts, nfa.read(texts)):
+                    if states & nfa.F:
+                        matched.setdefault(text, i)
+
+        # literals whose rule comes after the matching rule can never win
+        keywords = {
+            text: first[text]
+            for text in texts
+            if text in matched and first[text] < matched[text]
+        }
+        keyword_rules = {matched[text] for text in keywords}
+        kept = [i for i in range(len(regexes)) if literals.get(i) not in matched]
+        return kept, keywords, keyword_rules
+
+    def _thompson(self, i: int, regex: Regex) -> NFA[int]:
+        """The Thompson NFA of rule `i`, from the fragment cache if there is one."""
+        if self.fragments is not None:
+            return self.fragments.nfa(self.spec[i][1])
+        return regex.thompson(ranges=True)
+
+    def _compile_nfa(
+        self, regexes: list[Regex], kept: list[int], nfas: dict[int, NFA[int]]
+    ) -> None:
+        stats = self.stats
+        clock = time.perf_counter
+
+        t0 = clock()
+        # character ranges stay one symbol each until compress_alphabet
+        spec_nfas: list[NFA[int]] = [
+            nfas[i] if i in nfas else self._thompson(i, regexes[i]) for i in kept
+        ]
+        t1 = clock()
         res = unite_nfas(spec_nfas)
         lexer_nfa: NFA[int] = res[0]
-        nfa_final_states_dict: dict[int, int] = res[1]
-        lexer_dfa = lexer_nfa.subset_construction()
-        sink_states = set()
-        for state in lexer_dfa.K:
-            if lexer_dfa.is_in_sink_state(state):
-                sink_states.add(state)
-
-        self.dfa = lexer_dfa
-        self.sink_states = sink_states
-        self.spec = spec
-        self.nfa_final_states_dict = nfa_final_states_dict
+        # unite_nfas numbers the rules by their place in kept
+        nfa_final_states_dict: dict[int, int] = {
+            state: kept[rule] for state, rule in res[1].items()
+        }
+        t2 = clock()
+        # one DFA column per class of characters that every rule treats alike
+        lexer_nfa, symbol_classes = lexer_nfa.compress_alphabet()
+        t3 = clock()
+        if stats is not None:
+            stats.compile_seconds.update(
+                thompson=stats.compile_seconds["thompson"] + t1 - t0,
+                unite_nfas=t2 - t1,
+                compress_alphabet=t3 - t2,
+            )
+            stats.nfa_states = len(lexer_nfa.K)
+            stats.nfa_transitions = sum(len(p) for p in lexer_nfa.d.values())
 
-    def select_match(self, dfa_final_state: frozenset[int]) -> str | None:
-        indeces = []
-        for nfa_state in dfa_final_state:
-            if nfa_state in self.nfa_final_states_dict:
-                indeces.append(self.nfa_final_states_dict[nfa_state])
+        if self.lazy:
+            self.table = LazyDFA(
+                lexer_nfa,
+                symbol_classes,
+                nfa_final_states_dict,
+                len(regexes),
+                self.max_states,
+            )
+            return
 
-        if len(indeces) == 0:
-            return None
+        lexer_dfa, nfa_states = lexer_nfa.subset_construction_masks()
+        t4 = clock()
 
-        return self.spec[min(indeces)][0]
+        select_mask = _rule_selector(
+            {
+                i: nfa_final_states_dict[nfa_state]
+                for i, nfa_state in enumerate(nfa_states)
+                if nfa_state in nfa_final_states_dict
+            },
+            len(regexes),
+        )
+        # the subset states are only needed to pick the winning rule, so the
+        # table keeps the rule index and the subsets can be dropped
+        self.table = compile_dfa(lexer_dfa, select_mask, symbol_classes).minimize()
+        if stats is not None:
+            stats.compile_seconds.update(
+                subset_construction=t4 - t3,
+                compile_table=clock() - t4,
+            )
+            stats.dfa_states = len(lexer_dfa.K)
+            stats.dfa_transitions = len(lexer_dfa.d)
 
-    def lex(self, word: str) -> list[tuple[str, str]] | None:
-        line = 0
-        line_idx = 0
+    def _compile_direct(self, regexes: list[Regex], kept: list[int]) -> None:
+        stats = self.stats
+        clock = time.perf_counter
+
+        t0 = clock()
+        lexer_dfa, positions, symbol_classes = followpos_dfa(
+            [regexes[i] for i in kept]
+        )
+        t1 = clock()
+
+        # the end positions stand in for the NFA final states
+        select_mask = _rule_selector(
+            {position: kept[rule] for position, rule in positions.ends.items()},
+            len(regexes),
+        )
+
+        self.table = compile_dfa(lexer_dfa, select_mask, symbol_classes).minimize()
+        if stats is not None:
+            stats.compile_seconds.update(
+                followpos=t1 - t0,
+                compile_table=clock() - t1,
+            )
+            stats.dfa_states = len(lexer_dfa.K)
+            stats.dfa_transitions = len(lexer_dfa.d)
+
+    def select_match(self, state: int) -> str | None:
+        """Name of the rule that wins in `state` of the table, None if the
+        state is not accepting.  Keywords left out of the table are not
+        looked up, see CompiledDFA.keywords."""
+        rule = self.table.accept[state]
+        return self.spec[rule][0] if rule >= 0 else None
+
+    def lex(self, word: str, linear: bool = False) -> list[tuple[str, str]] | None:
+        """Splits `word` into (rule name, lexeme) tokens by maximal munch.
+
+        With `linear` set, the (state, position) pairs known to fail are
+        memoized, which bounds the work to O(len(word)) for any spec at the
+        cost of extra memory.
+        """
+        failed: dict[int, int] | None = {} if linear else None
+        skip = self.skip
         start_index = 0
-        end_index = 0
-        in_sink_state = False
-        curr_idx = 0
         tokens = []
         while start_index < len(word):
-            in_sink_state = False
-            curr_state: frozenset[int] = self.dfa.q0
-            token = ""
-            longest_accepted = 0
-            last_final_state: frozenset[int] = self.dfa.q0
-            while end_index < len(word):
-                curr_idx = end_index
-                end_index += 1
-                token = word[start_index:end_index]
-
-                new_state = self.dfa.step(curr_state, token[-1])
-                if new_state in self.dfa.F:
-                    longest_accepted = end_index - start_index
-                    last_final_state = new_state
-                    if token[-1] == "\n":
-                        line += 1
-                        line_idx = end_index
-                elif self.dfa.is_in_sink_state(new_state):
-                    end_index = start_index + longest_accepted
-                    in_sink_state = True
-                    break
-                curr_state = new_state
-
-            if in_sink_state and last_final_state == self.dfa.q0:
-                token = ""
-                match = f"No viable alternative at character {curr_idx - line_idx}, line {line}"
-                tokens.clear()
-                tokens.append((token, match))
-                break
-
-            elif not in_sink_state and last_final_state == self.dfa.q0:
-                token = ""
-                match = f"No viable alternative at character EOF, line {line}"
-                tokens.clear()
-                tokens.append((token, match))
-                break
+            if failed is None:
+                rule, end_index, stop = self.table.longest_match(word, start_index)
             else:
-                token = word[start_index:end_index]
-                match = self.select_match(last_final_state)
-                tokens.append((match, token))
+                rule, end_index, stop, _ = self.table.longest_match_linear(
+                    word, start_index, None, failed
+                )
+
+            if rule < 0 or end_index == start_index:
+                return [("", str(self._error(word, stop)))]
+
+            if not skip[rule]:
+                tokens.append((self.spec[rule][0], word[start_index:end_index]))
+            start_index = end_index
+        return tokens
+
+    def count(self, text: str) -> dict[str, int]:
+        """Number of tokens of each rule name in `text`, skipped rules included.
 
+        No token is built; raises LexError if no rule matches.
+        """
+        longest_match = self.table.longest_match
+        counts = [0] * len(self.spec)
+        start_index = 0
+        while start_index < len(text):
+            rule, end_index, stop = longest_match(text, start_index)
+            if rule < 0 or end_index == start_index:
+                raise self._error(text, stop)
+            counts[rule] += 1
+            start_index = end_index
+
+        histogram = dict.fromkeys((name for name, _ in self.spec), 0)
+        for (name, _), count in zip(self.spec, counts):
+            histogram[name] += count
+        return histogram
+
+    def lex_stream(self, word: str) -> TokenStream:
+        """Lexes `word` into a TokenStream, raises LexError if no rule matches."""
+        stream = TokenStream(word, [name for name, _ in self.spec])
+        longest_match = self.table.longest_match
+        skip = self.skip
+        add_rule = stream.rules.append
+        add_start = stream.starts.append
+        add_end = stream.ends.append
+        start_index = 0
+        while start_index < len(word):
+            rule, end_index, stop = longest_match(word, start_index)
+            if rule < 0 or end_index == start_index:
+                raise self._error(word, stop)
+            if not skip[rule]:
+                add_rule(rule)
+                add_start(start_index)
+                add_end(end_index)
             start_index = end_index
-            if start_index + 1 == len(word) and longest_accepted == 0:
+        return stream
+
+    def lex_batch(self, documents: list[str]) -> TokenBatch:
+        """lex_stream for many short documents, stepped together with NumPy.
+
+        Returns the tokens of all the documents in one TokenBatch, which
+        holds the LexError of a document that fails instead of raising it.
+        Needs NumPy and a compiled table.
+        """
+        from .Batch import lex_batch
+
+        return lex_batch(self, documents)
+
+    def lex_spans(self, word: str) -> Spans:
+        """Lexes `word` into (rule name, start, end, lookahead) spans.
+
+        `lookahead` is one past the furthest character that the scans of this
+        token and of every token before it read, see relex.  Raises LexError.
+        """
+        spans = []
+        lookahead = 0
+        start_index = 0
+        while start_index < len(word):
+            rule, end_index, stop = self.table.longest_match(word, start_index)
+            if rule < 0 or end_index == start_index:
+                raise self._error(word, stop)
+            lookahead = max(lookahead, stop + 1)
+            spans.append((self.spec[rule][0], start_index, end_index, lookahead))
+            start_index = end_index
+        return Spans(spans)
+
+    def relex(
+        self, text: str, spans: Spans, offset: int, deleted: int, inserted: str
+    ) -> range:
+        """Updates the spans of lex_spans after an edit, `text` is the new text.
+
+        The edit replaced `deleted` characters at `offset` by `inserted`.
+        Lexing restarts after the last token whose scan, and the scans
+        before it, stayed in front of the edit, and stops as soon as a new
+        token starts where a shifted old token started after the edit.  The
+        old tokens from there on are kept and only shifted.  `spans` is
+        updated in place; returns the indices of the new spans in it.
+        """
+        delta = len(inserted) - deleted
+        first = bisect_right(spans, offset, key=lambda span: span[3])
+        start_index = spans[first - 1][2] if first > 0 else 0
+        lookahead = spans[first - 1][3] if first > 0 else 0
+        # the first old token that starts after the deleted text
+        old = bisect_left(spans, offset + deleted, first, key=lambda span: span[1])
+
+        new_spans = []
+        while start_index < len(text):
+            while old < len(spans) and spans[old][1] + delta < start_index:
+                old += 1
+            # the old and new runs agree from here on if they start at the same
+            # position and neither read past it before
+            if (
+                old < len(spans)
+                and spans[old][1] + delta == start_index
+                and lookahead <= start_index + 1
+                and (spans[old - 1][3] if old > 0 else 0) + delta <= start_index + 1
+            ):
                 break
+
+            rule, end_index, stop = self.table.longest_match(text, start_index)
+            if rule < 0 or end_index == start_index:
+                raise self._error(text, stop)
+            lookahead = max(lookahead, stop + 1)
+            new_spans.append((self.spec[rule][0], start_index, end_index, lookahead))
+            start_index = end_index
+        else:
+            old = len(spans)
+
+        spans.splice(first, old, new_spans, delta)
+        return range(first, first + len(new_spans))
+
+    def lex_parallel(
+        self,
+        word: str,
+        workers: int | None = None,
+        chunk_size: int = 1 << 20,
+        overlap: int = 1 << 12,
+    ) -> list[tuple[str, str]] | None:
+        """Same result as lex, with chunks of `word` lexed in a process pool.
+
+        Every chunk is lexed speculatively from q0 at its first character.
+        A worker gets its chunk and the next `overlap` characters, and stops
+        at a token that could run past them; the table is sent to each
+        worker once.  From the end of the previous chunk's tokens, and from
+        where a worker stopped, tokens are lexed sequentially until they
+        reach a token start of the chunk; from there on both runs produce
+        the same tokens.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunk_size = max(chunk_size, len(word) // (4 * workers) + 1)
+        if workers <= 1 or len(word) <= chunk_size:
+            return self.lex(word)
+
+        bounds = [
+            (chunk_start, min(chunk_start + chunk_size, len(word)))
+            for chunk_start in range(0, len(word), chunk_size)
+        ]
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self.table,)
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _lex_chunk,
+                    word[chunk_start : chunk_end + overlap],
+                    chunk_start,
+                    chunk_end,
+                    chunk_end + overlap >= len(word),
+                )
+                for chunk_start, chunk_end in bounds
+            ]
+
+            names = [name for name, _ in self.spec]
+            skip = self.skip
+            tokens = []
+            start_index = 0
+            for (_, chunk_end), future in zip(bounds, futures):
+                triples = future.result()
+                starts = triples[1::3]
+                i = 0
+                while start_index < chunk_end:
+                    # the rest of the worker's tokens agree with a sequential run
+                    i = bisect_left(starts, start_index, i)
+                    if i < len(starts) and starts[i] == start_index:
+                        ends = triples[3 * i + 2 :: 3]
+                        tokens.extend(
+                            (names[rule], word[token_start:token_end])
+                            for rule, token_start, token_end in zip(
+                                triples[3 * i :: 3], starts[i:], ends
+                            )
+                            if not skip[rule]
+                        )
+                        start_index = ends[-1]
+                        i = len(starts)
+                        continue
+
+                    rule, end_index, stop = self.table.longest_match(word, start_index)
+                    if rule < 0 or end_index == start_index:
+                        return [("", str(self._error(word, stop)))]
+                    if not skip[rule]:
+                        tokens.append((names[rule], word[start_index:end_index]))
+                    start_index = end_index
+
         return tokens
+
+    def _error(self, word: str, stop: int) -> LexError:
+        line, column = LineIndex(word).position(stop)
+        return LexError(stop, line, column, stop == len(word))
+
+    def lex_iter(
+        self, source: str | TextIO | Iterable[str], chunk_size: int = 1 << 16
+    ) -> Iterator[tuple[str, str]]:
+        """Yields (rule name, lexeme) tokens from a string, a text file or chunks.
+
+        Only the tail of the input that is not yet split into tokens is kept
+        in memory, with at most as much text again read ahead.  A scan that
+        runs into the end of the text read so far is resumed where it was
+        once more is read, so a token spread over many chunks is scanned
+        once and copied a logarithmic number of times.  If no rule matches,
+        LexError is raised once every token before the error has been
+        yielded.
+        """
+        if isinstance(source, str):
+            chunks: Iterator[str] = iter((source,))
+        elif hasattr(source, "read"):
+            chunks = iter(lambda: source.read(chunk_size), "")
+        else:
+            chunks = iter(source)
+
+        buffer = ""
+        # absolute offset of buffer[0] and line info of the text dropped before it
+        offset = 0
+        line = 0
+        line_idx = 0
+        start_index = 0
+        exhausted = False
+        resume_match = self.table.resume_match
+        scan = None
+        while not exhausted or start_index < len(buffer):
+            rule, end_index, stop, scan = resume_match(
+                buffer, start_index, scan, exhausted
+            )
+
+            # the scan ran into the end of the buffer, the match may still grow
+            if stop == len(buffer) and not exhausted:
+                # at least as much as is left of the buffer
+                read = []
+                size = 0
+                while size <= len(buffer) - start_index:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    read.append(chunk)
+                    size += len(chunk)
+                line += buffer.count("\n", 0, start_index)
+                last_newline = buffer.rfind("\n", 0, start_index)
+                if last_newline >= 0:
+                    line_idx = offset + last_newline + 1
+                offset += start_index
+                buffer = buffer[start_index:] + "".join(read)
+                start_index = 0
+                continue
+            scan = None
+
+            if rule < 0 or end_index == start_index:
+                line += buffer.count("\n", 0, stop)
+                last_newline = buffer.rfind("\n", 0, stop)
+                if last_newline >= 0:
+                    line_idx = offset + last_newline + 1
+                position = offset + stop
+                raise LexError(
+                    position, line, position - line_idx, stop == len(buffer)
+                )
+
+            if not self.skip[rule]:
+                yield self.spec[rule][0], buffer[start_index:end_index]
+            start_index = end_index
+
+    def lex_file(self, path: str | os.PathLike) -> Iterator[tuple[str, int, int]]:
+        """Yields (rule name, start, end) tokens of a UTF-8 file, in byte offsets.
+
+        The file is memory-mapped and lexed byte by byte, so no lexeme is
+        decoded or copied and the file does not have to fit in memory.
+        Errors are raised as LexError, with byte positions and columns.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                byte_columns = self.table.byte_columns()
+                size = len(data)
+                start_index = 0
+                while start_index < size:
+                    rule, end_index, stop = self.table.longest_match_bytes(
+                        data, start_index, size, byte_columns
+                    )
+                    if rule < 0 or end_index == start_index:
+                        line, column = LineIndex(data).position(stop)
+                        raise LexError(stop, line, column, stop == size)
+
+                    if not self.skip[rule]:
+                        yield self.spec[rule][0], start_index, end_index
+                    start_index = end_index
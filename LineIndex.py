@@ -0,0 +1,36 @@
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex:
+    """Line starts of a text, found only as far as positions are asked for.
+
+    `text` may be a str or, for byte offsets, bytes or an mmap.  The lexing
+    loops never track lines; a position is resolved by binary search over
+    the line starts, and the text is searched for newlines with `find` only
+    up to the furthest offset resolved so far.
+    """
+
+    def __init__(self, text) -> None:
+        self.text = text
+        self.newline = "\n" if isinstance(text, str) else b"\n"
+        self.starts = array("q", [0])
+        # every line start up to this offset is in `starts`
+        self.scanned = 0
+
+    def position(self, offset: int) -> tuple[int, int]:
+        """(line, column) of `offset`, both counted from 0."""
+        if offset > self.scanned:
+            self._extend(offset)
+        line = bisect_right(self.starts, offset) - 1
+        return line, offset - self.starts[line]
+
+    def _extend(self, offset: int) -> None:
+        find = self.text.find
+        newline = self.newline
+        add = self.starts.append
+        i = find(newline, self.scanned, offset)
+        while i >= 0:
+            add(i + 1)
+            i = find(newline, i + 1, offset)
+        self.scanned = offset
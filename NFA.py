@@ -1,11 +1,23 @@
 from .DFA import DFA
 
+from bisect import bisect_left
 from dataclasses import dataclass
 from collections.abc import Callable
 
 EPSILON = ""
 
 
+def symbol_range(symbol: str) -> tuple[int, int]:
+    """Inclusive code point range of a symbol.
+
+    A symbol is a single character, or for NFAs built with ranges, a
+    two-character string such as "az" that stands for the range [a-z].
+    """
+    if len(symbol) == 1:
+        return ord(symbol), ord(symbol)
+    return ord(symbol[0]), ord(symbol[1])
+
+
 @dataclass
 class NFA[STATE]:
     S: set[str]
@@ -29,44 +41,214 @@ class NFA[STATE]:
 
         return frozenset(closure)
 
-    def subset_construction(self) -> DFA[frozenset[STATE]]:
-        dfa_states = set()
-        dfa_transitions = {}
-        dfa_initial_state = self.epsilon_closure(self.q0)
-        dfa_final_states = set()
+    def closure_masks(self) -> tuple[list[STATE], dict[STATE, int]]:
+        """Computes every epsilon closure once, as a bitmask over the states.
+
+        Bit i of a mask stands for states[i] of the returned list.
+        """
+        states = list(self.K)
+        bits = {state: 1 << i for i, state in enumerate(states)}
+        closures: dict[STATE, int] = {}
+
+        for state in states:
+            closure = 0
+            stack = [state]
+            while stack:
+                current_state = stack.pop()
+                if closure & bits[current_state]:
+                    continue
+                # a closure that is already known is complete, reuse it
+                if current_state in closures:
+                    closure |= closures[current_state]
+                    continue
+                closure |= bits[current_state]
+                for next_state in self.d.get((current_state, EPSILON), ()):
+                    if not closure & bits[next_state]:
+                        stack.append(next_state)
+            closures[state] = closure
+
+        return states, closures
+
+    def read(self, words: list[str]) -> list[set[STATE]]:
+        """The states the NFA can be in after reading each of `words`.
+
+        Range symbols are understood, so this also works before
+        compress_alphabet.  Subsets are stepped as bitmasks over the
+        closures of closure_masks.
+        """
+        states, closures = self.closure_masks()
+        index = {state: i for i, state in enumerate(states)}
+        # for each NFA state, the closure reached on each symbol range
+        outgoing: list[list[tuple[int, int, int]]] = [[] for _ in states]
+        for (state, symbol), next_states in self.d.items():
+            if symbol == EPSILON:
+                continue
+            target = 0
+            for next_state in next_states:
+                target |= closures[next_state]
+            outgoing[index[state]].append((*symbol_range(symbol), target))
 
+        results = []
+        for word in words:
+            current = closures[self.q0]
+            for c in word:
+                code = ord(c)
+                next_current = 0
+                while current:
+                    low = current & -current
+                    current ^= low
+                    for low_code, high_code, target in outgoing[low.bit_length() - 1]:
+                        if low_code <= code <= high_code:
+                            next_current |= target
+                current = next_current
+                if not current:
+                    break
+            results.append({states[i] for i in range(len(states)) if current >> i & 1})
+        return results
+
+    def subset_construction_masks(self) -> tuple[DFA[int], list[STATE]]:
+        """Subset construction with the subset states interned as bitmasks.
+
+        Returns the DFA together with the list that maps bit i to its NFA state.
+        """
+        states, closures = self.closure_masks()
+
+        # for each NFA state, the closure reached on each symbol
+        moves: list[list[tuple[str, int]]] = [[] for _ in states]
+        index = {state: i for i, state in enumerate(states)}
+        for (state, symbol), next_states in self.d.items():
+            if symbol == EPSILON:
+                continue
+            target = 0
+            for next_state in next_states:
+                target |= closures[next_state]
+            moves[index[state]].append((symbol, target))
+
+        final_mask = 0
+        for state in self.F:
+            final_mask |= 1 << index[state]
+
+        dfa_initial_state = closures[self.q0]
+        dfa_states = {dfa_initial_state}
+        dfa_transitions: dict[tuple[int, str], int] = {}
         stack = [dfa_initial_state]
-        dfa_states.add(dfa_initial_state)
 
         while stack:
             current_states = stack.pop()
 
-            for symbol in self.S:
-                next_states = set()
+            next_masks = dict.fromkeys(self.S, 0)
+            remaining = current_states
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                for symbol, target in moves[low.bit_length() - 1]:
+                    next_masks[symbol] |= target
 
-                for state in current_states:
-                    transitions = self.d.get((state, symbol), set())
-                    for transition_state in transitions:
-                        next_states |= self.epsilon_closure(transition_state)
+            for symbol, next_states in next_masks.items():
+                if next_states not in dfa_states:
+                    stack.append(next_states)
+                    dfa_states.add(next_states)
 
-                next_states_frozen = frozenset(next_states)
+                dfa_transitions[(current_states, symbol)] = next_states
 
-                if next_states_frozen not in dfa_states:
-                    stack.append(next_states_frozen)
-                    dfa_states.add(next_states_frozen)
+        return (
+            DFA(
+                S=self.S,
+                K=dfa_states,
+                q0=dfa_initial_state,
+                d=dfa_transitions,
+                F={state for state in dfa_states if state & final_mask},
+            ),
+            states,
+        )
 
-                dfa_transitions[(current_states, symbol)] = next_states_frozen
+    def subset_construction(self) -> DFA[frozenset[STATE]]:
+        dfa, states = self.subset_construction_masks()
 
-        for state in dfa_states:
-            if any(nfa_state in self.F for nfa_state in state):
-                dfa_final_states.add(state)
+        def to_frozenset(mask: int) -> frozenset[STATE]:
+            return frozenset(
+                state for i, state in enumerate(states) if mask >> i & 1
+            )
 
+        subsets = {mask: to_frozenset(mask) for mask in dfa.K}
         return DFA(
-            S=self.S,
-            K=dfa_states,
-            q0=dfa_initial_state,
-            d=dfa_transitions,
-            F=dfa_final_states,
+            S=dfa.S,
+            K=set(subsets.values()),
+            q0=subsets[dfa.q0],
+            d={
+                (subsets[q], symbol): subsets[p]
+                for (q, symbol), p in dfa.d.items()
+            },
+            F={subsets[state] for state in dfa.F},
+        )
+
+    def symbol_classes(self) -> list[tuple[int, int, str]]:
+        """Splits the code points of the alphabet into equivalence classes.
+
+        Two characters are equivalent when every state has the same
+        transitions on both of them, so the automaton cannot tell them apart.
+        Range symbols are split only at their ends, so the work depends on the
+        number of symbols and not on the size of the ranges.  Returns sorted,
+        disjoint, inclusive (low, high, representative) intervals; the
+        representative is the first character of the class.
+        """
+        transitions = [
+            (state, symbol_range(symbol), next_states)
+            for (state, symbol), next_states in self.d.items()
+            if symbol != EPSILON
+        ]
+        bounds = sorted(
+            {low for _, (low, _), _ in transitions}
+            | {high + 1 for _, (_, high), _ in transitions}
+        )
+
+        # the moves of every elementary interval between two bounds
+        moves: list[dict[STATE, set[STATE]]] = [{} for _ in bounds]
+        for state, (low, high), next_states in transitions:
+            for i in range(bisect_left(bounds, low), bisect_left(bounds, high + 1)):
+                moves[i].setdefault(state, set()).update(next_states)
+
+        representatives: dict[frozenset, str] = {}
+        classes = []
+        for i, interval_moves in enumerate(moves):
+            if not interval_moves:
+                continue
+            signature = frozenset(
+                (state, frozenset(next_states))
+                for state, next_states in interval_moves.items()
+            )
+            representative = representatives.setdefault(signature, chr(bounds[i]))
+            classes.append((bounds[i], bounds[i + 1] - 1, representative))
+
+        return classes
+
+    def compress_alphabet(self) -> tuple["NFA[STATE]", list[tuple[int, int, str]]]:
+        """Keeps one single-character symbol per equivalence class.
+
+        Returns the new NFA and the intervals of symbol_classes.
+        """
+        classes = self.symbol_classes()
+        lows = [low for low, _, _ in classes]
+        d: dict[tuple[STATE, str], set[STATE]] = {}
+        for (q, symbol), p_states in self.d.items():
+            if symbol == EPSILON:
+                d[(q, symbol)] = p_states
+                continue
+            low, high = symbol_range(symbol)
+            i = bisect_left(lows, low)
+            while i < len(classes) and classes[i][0] <= high:
+                d.setdefault((q, classes[i][2]), set()).update(p_states)
+                i += 1
+
+        return (
+            NFA(
+                S={representative for _, _, representative in classes},
+                K=self.K,
+                q0=self.q0,
+                d=d,
+                F=self.F,
+            ),
+            classes,
         )
 
     def remap_states[
@@ -85,6 +267,36 @@ class NFA[STATE]:
         )
 
 
+class NFABuilder:
+    """Shared state counter and transition store for Thompson's construction.
+
+    Regex nodes emit their states and transitions straight into one builder,
+    so no sub-automaton is ever copied or renumbered.  With `ranges` set,
+    character ranges are emitted as one range symbol (see symbol_range)
+    instead of one transition per character; such NFAs have to go through
+    compress_alphabet before subset construction.
+    """
+
+    def __init__(self, ranges: bool = False) -> None:
+        self.ranges = ranges
+        self.S: set[str] = set()
+        self.n_states = 0
+        self.d: dict[tuple[int, str], set[int]] = {}
+
+    def new_state(self) -> int:
+        state = self.n_states
+        self.n_states += 1
+        return state
+
+    def add_transition(self, q: int, symbol: str, p: int) -> None:
+        if symbol != EPSILON:
+            self.S.add(symbol)
+        self.d.setdefault((q, symbol), set()).add(p)
+
+    def build(self, q0: int, F: set[int]) -> NFA[int]:
+        return NFA(self.S, set(range(self.n_states)), q0, self.d, F)
+
+
 def unite_nfas(nfas: list[NFA[int]]) -> tuple[NFA[int], dict[int, int]]:
     # Create a new initial state for the united NFA
     # nfa_final_states_list = []
@@ -107,9 +319,11 @@ def unite_nfas(nfas: list[NFA[int]]) -> tuple[NFA[int], dict[int, int]]:
     for nfa in nfas:
         # print("nfas: ", nfa)
         
-        alphabet = alphabet.union(nfa.S)
+        # the fragments may be shared (see FragmentCache), so they are only
+        # read and offset, and the united sets grow in place
+        alphabet.update(nfa.S)
         remapped_nfa = nfa.remap_states(lambda state: state + offset)
-        states = states.union(remapped_nfa.K)
+        states.update(remapped_nfa.K)
         transitions[start_tr] |= {remapped_nfa.q0}
         transitions.update(remapped_nfa.d)
         offset += len(remapped_nfa.K)
@@ -1,6 +1,9 @@
-from .NFA import NFA
+from .NFA import NFA, NFABuilder, EPSILON
 from dataclasses import dataclass
-from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .Followpos import Followpos
 
 
 class Regex:
@@ -9,9 +12,24 @@ class Regex:
     children: list["Regex"]
     alphabet: set[str]
 
-    def thompson(self) -> NFA[int]:
+    def thompson(self, ranges: bool = False) -> NFA[int]:
+        builder = NFABuilder(ranges)
+        start, final = self.emit(builder)
+        return builder.build(start, {final})
+
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        """Adds the automaton of this node to `builder`, returns (start, final)."""
+        raise NotImplementedError(
+            "the emit method of the Regex class should never be called"
+        )
+
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        """Adds the positions of this node to `builder` and links them.
+
+        Returns (nullable, firstpos, lastpos), the position sets as bitmasks.
+        """
         raise NotImplementedError(
-            "the thompson method of the Regex class should never be called"
+            "the positions method of the Regex class should never be called"
         )
 
 def print_tree(node: Regex, indent: int = 0):
@@ -43,60 +61,53 @@ class Alteration(Regex):
     def __init__(self):
         self.children = []
 
-    def thompson(self) -> NFA[int]:
-        offset = 1
-        children_nfas = []
-        for child in self.children:
-            child_nfa = child.thompson()
-            child_nfa = child_nfa.remap_states(lambda x: x + offset)
-            children_nfas.append(child_nfa)
-            offset += len(child_nfa.K)
-
-        final_state = offset
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        child_states = [child.emit(builder) for child in self.children]
+        final = builder.new_state()
 
-        states = set()
-        for child in children_nfas:
-            states = states.union(child.K)
-        states.add(0)
-        states.add(final_state)
-        d: dict[tuple[int, str], set[int]] = {}
+        for child_start, child_final in child_states:
+            builder.add_transition(start, EPSILON, child_start)
+            builder.add_transition(child_final, EPSILON, final)
 
-        for child in children_nfas:
-            for k, v in child.d.items():
-                d[k] = v
-        start_tr: tuple[int, str] = (0, "")
-        d[start_tr] = set()
-        for child in children_nfas:
-            d[start_tr].add(child.q0)
-            tr: tuple[int, str] = (child.F.pop(), "")
-            d[tr] = {final_state}
+        return start, final
 
-        return NFA(children_nfas[0].S, states, 0, d, {final_state})
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        nullable = False
+        first = last = 0
+        for child in self.children:
+            child_nullable, child_first, child_last = child.positions(builder)
+            nullable |= child_nullable
+            first |= child_first
+            last |= child_last
+        return nullable, first, last
 
 
 @dataclass
 class Concat(Regex):
-    def __init__(self, left: Regex, right: Regex):
-        self.children = [left, right]
+    def __init__(self, *children: Regex):
+        self.children = list(children)
         self.value = "concat"
 
-    def thompson(self) -> NFA[int]:
-        left_nfa = self.children[0].thompson()
-        half = len(left_nfa.K)
-        right_nfa = self.children[1].thompson()
-        right_nfa = right_nfa.remap_states(lambda x: x + half)
-        states: set = left_nfa.K.union(right_nfa.K)
-        d: dict[tuple[int, str], set[int]] = {}
-
-        for k, v in left_nfa.d.items():
-            d[k] = v
-        for k, v in right_nfa.d.items():
-            d[k] = v
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start, final = self.children[0].emit(builder)
+        for child in self.children[1:]:
+            child_start, child_final = child.emit(builder)
+            builder.add_transition(final, EPSILON, child_start)
+            final = child_final
 
-        epsilon_transition: tuple[int, str] = (left_nfa.F.pop(), "")
-        d[epsilon_transition] = {half}
+        return start, final
 
-        return NFA(right_nfa.S, states, left_nfa.q0, d, right_nfa.F)
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        nullable, first, last = self.children[0].positions(builder)
+        for child in self.children[1:]:
+            child_nullable, child_first, child_last = child.positions(builder)
+            builder.add_follow(last, child_first)
+            if nullable:
+                first |= child_first
+            last = child_last | last if child_nullable else child_last
+            nullable = nullable and child_nullable
+        return nullable, first, last
 
 
 @dataclass
@@ -104,27 +115,23 @@ class Kleene(Regex):
     def __init__(self):
         self.children = []
 
-    def thompson(self) -> NFA[int]:
-        offset = 1
-        nfa = self.children[0].thompson()
-        nfa = nfa.remap_states(lambda x: x + offset)
-        offset += len(nfa.K)
-        final_state = offset
-        states: set = nfa.K
-        states.add(0)
-        states.add(final_state)
-        d: dict[tuple[int, str], set[int]] = {}
-
-        for k, v in nfa.d.items():
-            d[k] = v
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        child_start, child_final = self.children[0].emit(builder)
+        final = builder.new_state()
 
         # add the 4 epsilon transitions
-        start_tr: tuple[int, str] = (0, "")
-        d[start_tr] = {nfa.q0, final_state}
-        final_tr: tuple[int, str] = (nfa.F.pop(), "")
-        d[final_tr] = {final_state, nfa.q0}
+        builder.add_transition(start, EPSILON, child_start)
+        builder.add_transition(start, EPSILON, final)
+        builder.add_transition(child_final, EPSILON, final)
+        builder.add_transition(child_final, EPSILON, child_start)
+
+        return start, final
 
-        return NFA(nfa.S, states, 0, d, {final_state})
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        _, first, last = self.children[0].positions(builder)
+        builder.add_follow(last, first)
+        return True, first, last
 
 
 @dataclass
@@ -132,27 +139,21 @@ class Plus(Regex):
     def __init__(self):
         self.children = []
 
-    def thompson(self) -> NFA[int]:
-        offset = 1
-        nfa = self.children[0].thompson()
-        nfa = nfa.remap_states(lambda x: x + offset)
-        offset += len(nfa.K)
-        final_state = offset
-        states: set = nfa.K
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        child_start, child_final = self.children[0].emit(builder)
+        final = builder.new_state()
 
-        states.add(0)
-        states.add(final_state)
-        d: dict[tuple[int, str], set[int]] = {}
+        builder.add_transition(start, EPSILON, child_start)
+        builder.add_transition(child_final, EPSILON, final)
+        builder.add_transition(child_final, EPSILON, child_start)
 
-        for k, v in nfa.d.items():
-            d[k] = v
+        return start, final
 
-        start_tr: tuple[int, str] = (0, "")
-        d[start_tr] = {nfa.q0}
-        final_tr: tuple[int, str] = (nfa.F.pop(), "")
-        d[final_tr] = {final_state, nfa.q0}
-
-        return NFA(nfa.S, states, 0, d, {final_state})
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        nullable, first, last = self.children[0].positions(builder)
+        builder.add_follow(last, first)
+        return nullable, first, last
 
 
 @dataclass
@@ -160,26 +161,21 @@ class Question(Regex):
     def __init__(self):
         self.children = []
 
-    def thompson(self) -> NFA[int]:
-        offset = 1
-        nfa = self.children[0].thompson()
-        nfa = nfa.remap_states(lambda x: x + offset)
-        offset += len(nfa.K)
-        final_state = offset
-        states: set = nfa.K
-        states.add(0)
-        states.add(final_state)
-        d: dict[tuple[int, str], set[int]] = {}
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        child_start, child_final = self.children[0].emit(builder)
+        final = builder.new_state()
+
+        # add the 3 epsilon transitions
+        builder.add_transition(start, EPSILON, child_start)
+        builder.add_transition(start, EPSILON, final)
+        builder.add_transition(child_final, EPSILON, final)
 
-        for k, v in nfa.d.items():
-            d[k] = v
-        # add the 5 epsilon transitions
-        start_tr: tuple[int, str] = (0, "")
-        d[start_tr] = {nfa.q0, final_state}
-        final_tr: tuple[int, str] = (nfa.F.pop(), "")
-        d[final_tr] = {final_state}
+        return start, final
 
-        return NFA(nfa.S, states, 0, d, {final_state})
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        _, first, last = self.children[0].positions(builder)
+        return True, first, last
 
 
 @dataclass
@@ -189,24 +185,33 @@ class Category(Regex):
         self.children = []
         self.alphabet = alphabet
 
-    def thompson(self) -> NFA:
-        nfa: NFA = NFA(self.alphabet, {0, 1}, 0, {}, {1})
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        final = builder.new_state()
         if self.value == "eps":
-            entry: tuple[int, str] = (0, "")
-            nfa.d[entry] = {1}
+            builder.add_transition(start, EPSILON, final)
         elif len(self.value) == 1:
-            entry: tuple[int, str] = (0, self.value)
-            nfa.d[entry] = {1}
+            builder.add_transition(start, self.value, final)
         elif len(self.value) == 2:
-            cat = self.expand_category(self.value)
-            for c in cat:
-                nfa.S.add(c)
-                entry: tuple[int, str] = (0, c)
-                nfa.d[entry] = {1}
+            if builder.ranges:
+                builder.add_transition(start, self.value, final)
+            else:
+                for c in self.expand_category(self.value):
+                    builder.add_transition(start, c, final)
         else:
             print("error invalid category")
 
-        return nfa
+        return start, final
+
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        if self.value == "eps":
+            return True, 0, 0
+        if len(self.value) not in (1, 2):
+            print("error invalid category")
+            return False, 0, 0
+        low, high = ord(self.value[0]), ord(self.value[-1])
+        position = 1 << builder.new_position([(low, high)])
+        return False, position, position
 
     def expand_category(self, cat: str) -> set[str]:
         start = ord(cat[0])
@@ -217,179 +222,255 @@ class Category(Regex):
         return alphabet
 
 
+@dataclass
+class CharClass(Regex):
+    """Any one character of a set of inclusive (low, high) ranges."""
+
+    def __init__(self, ranges: list[tuple[str, str]], alphabet: set[str]):
+        # sorted, with overlapping and adjacent ranges merged
+        merged: list[tuple[str, str]] = []
+        for low, high in sorted(ranges):
+            if merged and ord(low) <= ord(merged[-1][1]) + 1:
+                if high > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], high)
+            else:
+                merged.append((low, high))
+        self.ranges = merged
+        self.children = []
+        self.alphabet = alphabet
+
+    def emit(self, builder: NFABuilder) -> tuple[int, int]:
+        start = builder.new_state()
+        final = builder.new_state()
+        for low, high in self.ranges:
+            if low == high:
+                builder.add_transition(start, low, final)
+            elif builder.ranges:
+                builder.add_transition(start, low + high, final)
+            else:
+                for i in range(ord(low), ord(high) + 1):
+                    builder.add_transition(start, chr(i), final)
+
+        return start, final
+
+    def positions(self, builder: "Followpos") -> tuple[bool, int, int]:
+        position = 1 << builder.new_position(
+            [(ord(low), ord(high)) for low, high in self.ranges]
+        )
+        return False, position, position
+
+
 def parse_regex(regex: str) -> Regex:
     alphabet = form_alphabet(regex)
-    (expr, _) = parse_recursive(regex, 0, alphabet)
+    expr = simplify(parse(regex, alphabet), alphabet, {})
     expr.alphabet = alphabet
 
     return expr
 
 
-def parse_recursive(regex: str, idx: int, alphabet: set[str]) -> Tuple[Regex, int]:
-    escaped = False
-    stack = []
-    ret_idx = idx
-    i = idx
+def parse(regex: str, alphabet: set[str]) -> Regex:
+    """Builds the syntax tree of `regex` in one left to right pass.
+
+    Every open group is a list of alternatives, and every alternative a list
+    of the nodes read so far; postfix operators wrap the last node of the
+    current alternative and a closing parenthesis turns its group into a
+    node of the enclosing one.  Empty alternatives are dropped.
+    """
+    groups: list[list[list[Regex]]] = [[[]]]
+    i = 0
     while i < len(regex):
         c = regex[i]
-        if escaped:
-            stack.append(Category(c, alphabet))
-            escaped = False
-            i += 1
-            continue
-
+        sequence = groups[-1][-1]
         match c:
-            case "e":
-                if i + 2 < len(regex):
-                    if regex[i + 1] == "p" and regex[i + 2] == "s":
-                        stack.append(Category("eps", alphabet))
-                        i += 2
-                    else:
-                        stack.append(Category("e", alphabet))
+            case "\\":
+                if i + 1 < len(regex):
+                    sequence.append(Category(regex[i + 1], alphabet))
+                i += 1
+            case "e" if regex.startswith("ps", i + 1):
+                sequence.append(Category("eps", alphabet))
+                i += 2
+            case "*" | "+" | "?":
+                if sequence:
+                    expr = {"*": Kleene, "+": Plus, "?": Question}[c]()
+                    expr.children = [sequence.pop()]
+                    sequence.append(expr)
                 else:
-                    stack.append(Category("e", alphabet))
-            case "*":
-                stack.append(Kleene())
-            case "+":
-                stack.append(Plus())
-            case "?":
-                stack.append(Question())
+                    print("nothing to repeat")
             case "|":
-                stack.append(Alteration())
+                groups[-1].append([])
+            case "(":
+                groups.append([[]])
             case ")":
-                if idx == 0:
+                if len(groups) == 1:
                     print("right parenthesis")
                 else:
-                    ret_idx = i
-                    break
+                    groups[-2][-1].append(close_group(groups.pop(), alphabet))
             case "]":
                 print("]")
-            case "(":
-                (expr, new_idx) = parse_recursive(regex, i + 1, alphabet)
-                stack.append(expr)
-                i = new_idx
             case "[":
                 if i + 4 < len(regex):
                     if regex[i + 2] == "-" and regex[i + 4] == "]":
-                        stack.append(Category(regex[i + 1] + regex[i + 3], alphabet))
+                        sequence.append(Category(regex[i + 1] + regex[i + 3], alphabet))
                         i += 4
-            case "\\":
-                escaped = True
             case " ":
-                i += 1
-                continue
+                pass
             case _:
-                stack.append(Category(c, alphabet))
-        i += 1
-    # pass the stack through the kleene, concat, and alter functions
-    stack = kleene_stack(stack)
-    stack = concat_stack(stack)
-    stack = alter_stack(stack)
-
-    return stack[0], ret_idx
-
-# this function applies the kleene, plus, and question operators and returns a new stack
-def kleene_stack(regexes: list[Regex]) -> list[Regex]:
-    new_list = []
-    i = 0
-    while i < len(regexes):
-        if isinstance(regexes[i], Kleene) and len(regexes[i].children) == 0:
-            if isinstance(regexes[i - 1], Alteration) and len(regexes[i - 1].children) == 0:
-                new_list.append(regexes[i])
-                i+=1
-                continue
-            regexes[i].children.append(regexes[i - 1])
-            expr = Kleene()
-            expr.children = regexes[i].children
-            if len(new_list) > 0:
-                new_list.pop()
-            new_list.append(expr)
-
-        elif isinstance(regexes[i], Plus) and len(regexes[i].children) == 0:
-            if isinstance(regexes[i - 1], Alteration) and len(regexes[i - 1].children) == 0:
-                new_list.append(regexes[i])
-                i+=1
-                continue
-            regexes[i].children.append(regexes[i - 1])
-            expr = Plus()
-            expr.children = regexes[i].children
-            if len(new_list) > 0:
-                new_list.pop()
-            new_list.append(expr)
-
-        elif isinstance(regexes[i], Question) and len(regexes[i].children) == 0:
-            if isinstance(regexes[i - 1], Alteration) and len(regexes[i - 1].children) == 0:
-                new_list.append(regexes[i])
-                i+=1
-                continue
-            regexes[i].children.append(regexes[i - 1])
-            expr = Question()
-            expr.children = regexes[i].children
-            if len(new_list) > 0:
-                new_list.pop()
-            new_list.append(expr)
-
-        else:
-            new_list.append(regexes[i])
+                sequence.append(Category(c, alphabet))
         i += 1
 
-    return new_list
-
+    # groups left open are closed at the end of the regex
+    while len(groups) > 1:
+        groups[-2][-1].append(close_group(groups.pop(), alphabet))
+    return close_group(groups[0], alphabet)
+
+
+def close_group(alternatives: list[list[Regex]], alphabet: set[str]) -> Regex:
+    children: list[Regex] = []
+    for sequence in alternatives:
+        if len(sequence) == 1:
+            children.append(sequence[0])
+        elif sequence:
+            children.append(Concat(*sequence))
+
+    if not children:
+        return Category("eps", alphabet)
+    if len(children) == 1:
+        return children[0]
+    expr = Alteration()
+    expr.children = children
+    return expr
 
-# this function applies the concatenation operation on all elements and returns the new stack
-def concat_stack(regexes: list[Regex]) -> list[Regex]:
-    new_list = []
-    i = 0
-    while i < len(regexes):
-        current_element = regexes[i]
-
-        # Check if the current element is an alternation with no children
-        if (
-            isinstance(current_element, Alteration)
-            and len(current_element.children) == 0
-        ):
-            new_list.append(current_element)
-            i += 1
-            continue
 
-            # Check if I can concatenate to the previous element
-        if len(new_list) > 0 and not (
-            isinstance(new_list[-1], Alteration) and len(new_list[-1].children) == 0
-        ):
-            prev_el = new_list.pop()
-            expr = Concat(prev_el, current_element)
-            new_list.append(expr)
-            i += 1
+def simplify(expr: Regex, alphabet: set[str], nodes: dict[tuple, Regex]) -> Regex:
+    """Rewrites `expr` into an equivalent tree with fewer NFA states.
+
+    Nested concatenations and alternations are flattened, alternatives that
+    are single characters or ranges become one CharClass, duplicate
+    alternatives are dropped, and stacked *, + and ? collapse into one
+    operator.  Identical subtrees are shared through `nodes`, which maps the
+    key of every node built so far to the node.  The tree is walked with an
+    explicit stack, so deep nesting does not hit the recursion limit.
+    """
+    # simplified node of every node of `expr` whose children are done
+    done: dict[int, Regex] = {}
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node.children and not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children)
             continue
+        children = [done[id(child)] for child in node.children]
+        done[id(node)] = simplify_node(node, children, alphabet, nodes)
+    return done[id(expr)]
+
+
+def simplify_node(
+    expr: Regex, children: list[Regex], alphabet: set[str], nodes: dict[tuple, Regex]
+) -> Regex:
+    """Simplifies one node of simplify, given its simplified children."""
+    if isinstance(expr, Category):
+        if expr.value == "eps" or len(expr.value) != 2:
+            return intern(expr, ("Category", expr.value), nodes)
+        return intern(
+            CharClass([(expr.value[0], expr.value[1])], alphabet), None, nodes
+        )
 
-        if i + 1 < len(regexes):
-            next_element = regexes[i + 1]
-
-            if not isinstance(next_element, Alteration):
-                expr = Concat(current_element, next_element)
-                new_list.append(expr)
-                i += 1
-            else:
-                new_list.append(current_element)
+    if isinstance(expr, CharClass):
+        return intern(CharClass(expr.ranges, alphabet), None, nodes)
+
+    if isinstance(expr, Concat):
+        flat: list[Regex] = []
+        for child in children:
+            if isinstance(child, Concat):
+                flat.extend(child.children)
+            elif not is_epsilon(child):
+                flat.append(child)
+        if not flat:
+            return intern(Category("eps", alphabet), ("Category", "eps"), nodes)
+        if len(flat) == 1:
+            return flat[0]
+        return intern(Concat(*flat), None, nodes)
+
+    if isinstance(expr, Alteration):
+        flat = []
+        ranges: list[tuple[str, str]] = []
+        optional = False
+        for child in children:
+            for alternative in (
+                child.children if isinstance(child, Alteration) else [child]
+            ):
+                if is_epsilon(alternative):
+                    optional = True
+                elif isinstance(alternative, CharClass):
+                    ranges.extend(alternative.ranges)
+                elif isinstance(alternative, Category):
+                    ranges.append((alternative.value, alternative.value))
+                else:
+                    flat.append(alternative)
+        if ranges:
+            flat.insert(0, intern(CharClass(ranges, alphabet), None, nodes))
+        # the same shared node may be reached through several alternatives
+        flat = list({id(child): child for child in flat}.values())
+
+        if not flat:
+            return intern(Category("eps", alphabet), ("Category", "eps"), nodes)
+        if len(flat) == 1:
+            result = flat[0]
         else:
-            new_list.append(current_element)
-        i += 1
-
-    return new_list
+            result = Alteration()
+            result.children = flat
+            result = intern(result, None, nodes)
+        if optional:
+            return simplify_repeat(Question, result, nodes)
+        return result
+
+    return simplify_repeat(type(expr), children[0], nodes)
+
+
+def simplify_repeat(
+    op: type[Regex], child: Regex, nodes: dict[tuple, Regex]
+) -> Regex:
+    if is_epsilon(child):
+        return child
+    if isinstance(child, (Kleene, Plus, Question)):
+        # x** is x*, x++ is x+ and x?? is x?; any other pair repeats x any
+        # number of times, including zero
+        if isinstance(child, op):
+            return child
+        op = Kleene
+        child = child.children[0]
+    expr = op()
+    expr.children = [child]
+    return intern(expr, None, nodes)
+
+
+def intern(expr: Regex, key: tuple | None, nodes: dict[tuple, Regex]) -> Regex:
+    """Returns the node already built with the same key, or records `expr`.
+
+    Children are interned before their parents, so a node is identified by
+    its class, value and the ids of its children.
+    """
+    if key is None:
+        if isinstance(expr, CharClass):
+            key = ("CharClass", *expr.ranges)
+        else:
+            key = (type(expr).__name__, *map(id, expr.children))
+    return nodes.setdefault(key, expr)
 
 
-# this function applies the remaining operation of alternation
-def alter_stack(regexes: list[Regex]) -> list[Regex]:
-    i = 0
+def is_epsilon(expr: Regex) -> bool:
+    return isinstance(expr, Category) and expr.value == "eps"
 
-    if len(regexes) == 1:
-        return regexes
-    final_regex = Alteration()
-    final_regex.children = []
-    # for how many alternations there are form only one top level alternation
-    while i < len(regexes):
-        if not (isinstance(regexes[i], Alteration) and len(regexes[i].children) == 0):
-            final_regex.children.append(regexes[i])
-        i += 1
 
-    return [final_regex]
+def literal(expr: Regex) -> str | None:
+    """The string `expr` matches if it matches exactly one, else None."""
+    if isinstance(expr, Concat):
+        parts = [literal(child) for child in expr.children]
+        return None if None in parts else "".join(parts)
+    if isinstance(expr, Category) and len(expr.value) == 1:
+        return expr.value
+    if isinstance(expr, CharClass) and len(expr.ranges) == 1:
+        low, high = expr.ranges[0]
+        return low if low == high else None
+    return None
@@ -0,0 +1,61 @@
+from collections.abc import Iterator
+
+
+class Spans:
+    """(rule name, start, end, lookahead) spans of lex_spans, kept by relex.
+
+    The spans from index `marker` on are stored without the shift that the
+    edits after them applied, and `delta` is added when they are read.  An
+    edit only moves the marker to itself, so its cost depends on the edit
+    and on the number of tokens between it and the previous edit, and the
+    tokens after it are never rebuilt.
+    """
+
+    def __init__(self, spans: list[tuple[str, int, int, int]] | None = None) -> None:
+        self.spans = [] if spans is None else spans
+        self.marker = len(self.spans)
+        self.delta = 0
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, index: int) -> tuple[str, int, int, int]:
+        if index < 0:
+            index += len(self.spans)
+        span = self.spans[index]
+        if index < self.marker or not self.delta:
+            return span
+        delta = self.delta
+        return span[0], span[1] + delta, span[2] + delta, span[3] + delta
+
+    def __iter__(self) -> Iterator[tuple[str, int, int, int]]:
+        for index in range(len(self.spans)):
+            yield self[index]
+
+    def splice(
+        self,
+        first: int,
+        last: int,
+        spans: list[tuple[str, int, int, int]],
+        delta: int,
+    ) -> None:
+        """Replaces spans[first:last] by `spans` and shifts the rest by `delta`."""
+        self._move(last)
+        self.spans[first:last] = spans
+        self.marker = first + len(spans)
+        self.delta += delta
+
+    def _move(self, marker: int) -> None:
+        spans = self.spans
+        delta = self.delta
+        if delta:
+            if marker > self.marker:
+                # these spans are read from now on without the shift
+                for i in range(self.marker, marker):
+                    name, start, end, lookahead = spans[i]
+                    spans[i] = (name, start + delta, end + delta, lookahead + delta)
+            else:
+                for i in range(marker, self.marker):
+                    name, start, end, lookahead = spans[i]
+                    spans[i] = (name, start - delta, end - delta, lookahead - delta)
+        self.marker = marker
@@ -0,0 +1,188 @@
+from dataclasses import dataclass, field
+from collections.abc import Callable, Iterator
+import functools
+import time
+
+
+@dataclass
+class LexerStats:
+    """Counters of an instrumented Lexer, see Lexer(stats=True).
+
+    Compile phases are wall times in seconds.  `chars_scanned` counts every
+    character the DFA read, `chars_rescanned` the ones read past the end of
+    the token that was finally chosen, which are read again by the next
+    token.  Only work done in this process is counted.
+    """
+
+    names: list[str]
+    compile_seconds: dict[str, float] = field(default_factory=dict)
+    nfa_states: int = 0
+    nfa_transitions: int = 0
+    dfa_states: int = 0
+    dfa_transitions: int = 0
+    table_states: int = 0
+    table_columns: int = 0
+    lex_calls: int = 0
+    lex_seconds: float = 0.0
+    chars_consumed: int = 0
+    chars_scanned: int = 0
+    chars_rescanned: int = 0
+    tokens: list[int] = field(default_factory=list)
+    _depth: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.tokens:
+            self.tokens = [0] * len(self.names)
+
+    def tokens_per_rule(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for name, count in zip(self.names, self.tokens):
+            counts[name] = counts.get(name, 0) + count
+        return counts
+
+    def as_dict(self) -> dict:
+        """Plain values only, ready for json.dumps or a metrics exporter."""
+        return {
+            "compile_seconds": dict(self.compile_seconds),
+            "nfa_states": self.nfa_states,
+            "nfa_transitions": self.nfa_transitions,
+            "dfa_states": self.dfa_states,
+            "dfa_transitions": self.dfa_transitions,
+            "table_states": self.table_states,
+            "table_columns": self.table_columns,
+            "lex_calls": self.lex_calls,
+            "lex_seconds": self.lex_seconds,
+            "chars_consumed": self.chars_consumed,
+            "chars_scanned": self.chars_scanned,
+            "chars_rescanned": self.chars_rescanned,
+            "tokens_per_rule": self.tokens_per_rule(),
+        }
+
+    def reset_lex(self) -> None:
+        self.lex_calls = 0
+        self.lex_seconds = 0.0
+        self.chars_consumed = 0
+        self.chars_scanned = 0
+        self.chars_rescanned = 0
+        self.tokens = [0] * len(self.names)
+
+    def record_match(
+        self, start: int, read: int, rule: int, match_end: int, previous: int = 0
+    ) -> None:
+        """Records a scan from `start` that read `read` characters, of which
+        the first `previous` were recorded before it was resumed."""
+        self.chars_scanned += read - previous
+        if rule >= 0 and match_end > start:
+            self.tokens[rule] += 1
+            self.chars_consumed += match_end - start
+            self.chars_rescanned += read - (match_end - start)
+
+    def record_batch(
+        self, counts: list[int], scanned: int, consumed: int, rescanned: int
+    ) -> None:
+        """Records scans that did not go through longest_match, see
+        Lexer.lex_batch; `counts` are the tokens found per rule."""
+        self.chars_scanned += scanned
+        self.chars_consumed += consumed
+        self.chars_rescanned += rescanned
+        for rule, count in enumerate(counts):
+            self.tokens[rule] += count
+
+    def timed[**P, R](self, f: Callable[P, R]) -> Callable[P, R]:
+        """Wraps a lexing method so that its calls and time are counted."""
+
+        @functools.wraps(f)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            # calls made from inside another timed call are not counted twice
+            if self._depth:
+                return f(*args, **kwargs)
+            self._depth += 1
+            t = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.lex_seconds += time.perf_counter() - t
+                self.lex_calls += 1
+                self._depth -= 1
+
+        return wrapper
+
+    def timed_iter[**P, T](
+        self, f: Callable[P, Iterator[T]]
+    ) -> Callable[P, Iterator[T]]:
+        """Like timed, for generators; the time spent in the consumer is not counted."""
+
+        @functools.wraps(f)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> Iterator[T]:
+            iterator = f(*args, **kwargs)
+            self.lex_calls += 1
+            while True:
+                t = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.lex_seconds += time.perf_counter() - t
+                yield item
+
+        return wrapper
+
+
+class InstrumentedTable:
+    """Forwards to a CompiledDFA or LazyDFA and records every scan in `stats`."""
+
+    def __init__(self, table, stats: LexerStats) -> None:
+        self.table = table
+        self.stats = stats
+
+    def __getattr__(self, name: str):
+        # "table" itself is only missing while unpickling
+        if name == "table":
+            raise AttributeError(name)
+        return getattr(self.table, name)
+
+    def longest_match(
+        self, word: str, start: int, end: int | None = None
+    ) -> tuple[int, int, int]:
+        if end is None:
+            end = len(word)
+        result = rule, match_end, stop = self.table.longest_match(word, start, end)
+        # a scan that stopped early also read the character at stop
+        self.stats.record_match(start, stop - start + (stop < end), rule, match_end)
+        return result
+
+    def resume_match(
+        self,
+        word: str,
+        start: int,
+        scan: tuple[int, int, int, int] | None,
+        final: bool,
+    ) -> tuple[int, int, int, tuple[int, int, int, int]]:
+        previous = 0 if scan is None else scan[1]
+        result = self.table.resume_match(word, start, scan, final)
+        rule, match_end, stop, scan = result
+        if final or stop < len(word):
+            self.stats.record_match(start, scan[1], rule, match_end, previous)
+        else:
+            # the token is only counted once its scan is done
+            self.stats.record_match(start, scan[1], -1, start, previous)
+        return result
+
+    def longest_match_linear(
+        self, word: str, start: int, end: int | None, failed: dict
+    ) -> tuple[int, int, int, int]:
+        result = rule, match_end, _, read = self.table.longest_match_linear(
+            word, start, end, failed
+        )
+        self.stats.record_match(start, read - start, rule, match_end)
+        return result
+
+    def longest_match_bytes(
+        self, data, start: int, end: int, byte_columns: list[int]
+    ) -> tuple[int, int, int]:
+        result = rule, match_end, stop = self.table.longest_match_bytes(
+            data, start, end, byte_columns
+        )
+        self.stats.record_match(start, stop - start + (stop < end), rule, match_end)
+        return result
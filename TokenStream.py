@@ -0,0 +1,131 @@
+from .LineIndex import LineIndex
+
+from array import array
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, overload
+
+if TYPE_CHECKING:
+    from .Lexer import LexError
+
+
+class TokenStream:
+    """Tokens of one input, stored as parallel columns of ints.
+
+    `rules[i]` is the spec index of token i and `starts[i]`/`ends[i]` its
+    offsets in `text`.  Lexemes and rule names are only built when a token
+    is accessed, and slicing returns another TokenStream over the same text.
+    Line and column numbers are only computed when `position` is called.
+    """
+
+    def __init__(
+        self,
+        text: str,
+        names: list[str],
+        rules: array | None = None,
+        starts: array | None = None,
+        ends: array | None = None,
+        lines: LineIndex | None = None,
+    ) -> None:
+        # offsets of inputs past 4 GiB characters do not fit in 32 bits
+        typecode = "I" if len(text) < 1 << 32 else "Q"
+        self.text = text
+        self.names = names
+        self.rules = array("I") if rules is None else rules
+        self.starts = array(typecode) if starts is None else starts
+        self.ends = array(typecode) if ends is None else ends
+        self.lines = lines
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @overload
+    def __getitem__(self, index: int) -> tuple[str, str]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "TokenStream": ...
+
+    def __getitem__(self, index: int | slice) -> "tuple[str, str] | TokenStream":
+        if isinstance(index, slice):
+            return TokenStream(
+                self.text,
+                self.names,
+                self.rules[index],
+                self.starts[index],
+                self.ends[index],
+                self.lines,
+            )
+        return self.names[self.rules[index]], self.text[
+            self.starts[index] : self.ends[index]
+        ]
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        names = self.names
+        text = self.text
+        for rule, start, end in zip(self.rules, self.starts, self.ends):
+            yield names[rule], text[start:end]
+
+    def name(self, index: int) -> str:
+        return self.names[self.rules[index]]
+
+    def lexeme(self, index: int) -> str:
+        return self.text[self.starts[index] : self.ends[index]]
+
+    def span(self, index: int) -> tuple[int, int]:
+        return self.starts[index], self.ends[index]
+
+    def position(self, index: int) -> tuple[int, int]:
+        """(line, column) where token `index` starts, both counted from 0."""
+        if self.lines is None:
+            self.lines = LineIndex(self.text)
+        return self.lines.position(self.starts[index])
+
+
+class TokenBatch:
+    """Tokens of many documents, stored as one set of parallel columns.
+
+    The tokens of document `doc` are `rules[i]`, `starts[i]` and `ends[i]`
+    for i in range(bounds[doc], bounds[doc + 1]), with offsets in that
+    document.  A document that failed has no tokens and its LexError in
+    `errors`.  Indexing builds the TokenStream of one document on demand.
+    """
+
+    def __init__(
+        self,
+        documents: list[str],
+        names: list[str],
+        rules: array,
+        starts: array,
+        ends: array,
+        bounds: array,
+        errors: dict[int, "LexError"],
+    ) -> None:
+        self.documents = documents
+        self.names = names
+        self.rules = rules
+        self.starts = starts
+        self.ends = ends
+        self.bounds = bounds
+        self.errors = errors
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __getitem__(self, doc: int) -> "TokenStream | LexError":
+        """The tokens of document `doc`, or its LexError if it failed."""
+        if doc < 0:
+            doc += len(self.documents)
+        if doc in self.errors:
+            return self.errors[doc]
+        first = self.bounds[doc]
+        last = self.bounds[doc + 1]
+        return TokenStream(
+            self.documents[doc],
+            self.names,
+            self.rules[first:last],
+            self.starts[first:last],
+            self.ends[first:last],
+        )
+
+    def __iter__(self) -> Iterator["TokenStream | LexError"]:
+        for doc in range(len(self.documents)):
+            yield self[doc]
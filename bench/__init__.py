@@ -0,0 +1,4 @@
+"""Benchmarks of lexer compile time and lex throughput.
+
+Run with `python -m <package>.bench`, see __main__.py for the options.
+"""
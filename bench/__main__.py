@@ -0,0 +1,118 @@
+"""Runs the benchmarks and prints the results as JSON.
+
+    python -m <package>.bench [--size CHARS] [--repeat N] [--spec NAME ...] [--label TEXT]
+
+Every spec is compiled once with stats=True for the time of each compile
+phase and the automaton sizes, timed as a whole both that way and with the
+direct followpos construction, and then lexed with Lexer.lex and
+Lexer.lex_stream; the adversarial spec is also lexed in linear mode.  Times
+are the best of --repeat runs, peak memory is measured in a separate run
+under tracemalloc so that it does not skew the timings.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from ..Lexer import Lexer
+from .inputs import INPUTS
+from .specs import SPECS
+
+
+def compile_phases(spec: list[tuple[str, str]]) -> dict:
+    """Phase times and automaton sizes, as recorded by the Lexer itself."""
+    stats = Lexer(spec, stats=True).stats.as_dict()
+    return {
+        "seconds": stats["compile_seconds"],
+        "nfa_states": stats["nfa_states"],
+        "nfa_transitions": stats["nfa_transitions"],
+        "dfa_states": stats["dfa_states"],
+        "dfa_transitions": stats["dfa_transitions"],
+        "table_states": stats["table_states"],
+        "table_columns": stats["table_columns"],
+    }
+
+
+def best_of(repeat: int, f) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = f()
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+def peak_memory(f) -> int:
+    tracemalloc.start()
+    try:
+        f()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_spec(name: str, size: int, repeat: int) -> dict:
+    spec = SPECS[name]
+    text = INPUTS[name](size)
+    result = {"spec": name, "rules": len(spec), "chars": len(text)}
+
+    result["compile"] = compile_phases(spec)
+    result["compile"]["total_seconds"], lexer = best_of(repeat, lambda: Lexer(spec))
+    result["compile"]["peak_bytes"] = peak_memory(lambda: Lexer(spec))
+    result["compile"]["direct_seconds"], _ = best_of(
+        repeat, lambda: Lexer(spec, direct=True)
+    )
+
+    modes = {
+        "lex": lambda: lexer.lex(text),
+        "lex_stream": lambda: lexer.lex_stream(text),
+    }
+    if name == "adversarial":
+        modes["lex_linear"] = lambda: lexer.lex(text, linear=True)
+
+    result["lex"] = {}
+    for mode, f in modes.items():
+        seconds, tokens = best_of(repeat, f)
+        n_tokens = len(tokens)
+        result["lex"][mode] = {
+            "seconds": seconds,
+            "tokens": n_tokens,
+            "mb_per_second": len(text.encode("utf-8")) / seconds / 1e6,
+            "tokens_per_second": n_tokens / seconds,
+            "peak_bytes": peak_memory(f),
+        }
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=200_000, help="input size in characters")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--spec", action="append", choices=sorted(SPECS), help="specs to run")
+    parser.add_argument("--label", default="", help="stored with the results, e.g. a commit id")
+    args = parser.parse_args(argv)
+
+    results = {
+        "label": args.label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": args.size,
+        "repeat": args.repeat,
+        "results": [],
+    }
+    for name in args.spec or SPECS:
+        # the adversarial input is quadratic without the linear mode
+        size = min(args.size, 2_000) if name == "adversarial" else args.size
+        results["results"].append(bench_spec(name, size, args.repeat))
+        print(f"done {name}", file=sys.stderr)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
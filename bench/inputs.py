@@ -0,0 +1,86 @@
+import random
+
+from .specs import C_KEYWORDS
+
+
+def programming(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    names = ["count", "buffer", "i", "j", "total_size", "node", "Next", "ptr2"]
+    words = ["todo", "Check", "the", "bounds", "here"]
+    statements = [
+        lambda: f"{rng.choice(names)} = {rng.choice(names)} + {rng.randint(0, 999)};",
+        lambda: f"if ({rng.choice(names)} <= {rng.randint(0, 99)}) {{ break; }}",
+        lambda: f"while ({rng.choice(names)} != {rng.choice(names)}) {{",
+        lambda: "}",
+        lambda: f'{rng.choice(names)}("value is {rng.randint(0, 9)}, ok.");',
+        lambda: "/* " + " ".join(rng.choice(words) for _ in range(4)) + " */",
+        lambda: f"{rng.choice(C_KEYWORDS[8:16])} {rng.choice(names)}[{rng.randint(1, 64)}];",
+        lambda: f"return {rng.choice(names)} * {rng.randint(0, 9)}.{rng.randint(0, 99)};",
+    ]
+    return _fill(size, lambda: "    " + rng.choice(statements)() + "\n")
+
+
+def log(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    levels = ["DEBUG", "INFO", "WARN", "ERROR"]
+    messages = ["request done", "cache miss", "retrying", "connection reset"]
+
+    def line() -> str:
+        return (
+            f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)} "
+            f"{rng.randint(10, 23)}:{rng.randint(10, 59)}:{rng.randint(10, 59)}."
+            f"{rng.randint(100, 999)} [{rng.choice(levels)}] "
+            f"worker-{rng.randint(1, 32)} {rng.choice(messages)} "
+            f"from=10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)} "
+            f"took={rng.randint(1, 5000)}\n"
+        )
+
+    return _fill(size, line)
+
+
+def keywords(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+
+    def word() -> str:
+        if rng.random() < 0.5:
+            return f"kw{rng.randint(0, 59)}x "
+        return f"kw{rng.randint(0, 99)}{rng.choice(['', 'y', 'xx'])} "
+
+    return _fill(size, word)
+
+
+def wide_ranges(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    ranges = [(0x61, 0x7A), (0xC0, 0x24F), (0x370, 0x3FF), (0x400, 0x4FF), (0x4E00, 0x9FFF)]
+
+    def word() -> str:
+        low, high = rng.choice(ranges)
+        if rng.random() < 0.1:
+            return str(rng.randint(0, 99999)) + " "
+        return "".join(chr(rng.randint(low, high)) for _ in range(rng.randint(1, 8))) + " "
+
+    return _fill(size, word)
+
+
+def adversarial(size: int, seed: int = 0) -> str:
+    return "a" * size
+
+
+def _fill(size: int, piece) -> str:
+    # whole pieces only, cutting one could leave an input that does not lex
+    parts = []
+    length = 0
+    while length < size:
+        part = piece()
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+INPUTS = {
+    "programming": programming,
+    "log": log,
+    "keywords": keywords,
+    "wide_ranges": wide_ranges,
+    "adversarial": adversarial,
+}
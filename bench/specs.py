@@ -0,0 +1,67 @@
+# Specs used by the benchmarks.  The regex syntax of this lexer has no
+# negated classes and no dot, and "eps" is the empty word, so the rules are
+# spelled out with ranges, escapes and alternations.
+
+LETTER = "([a-z]|[A-Z]|_)"
+DIGIT = "[0-9]"
+
+C_KEYWORDS = [
+    "if", "else", "while", "for", "do", "return", "break", "continue",
+    "int", "char", "void", "long", "short", "float", "double", "struct",
+    "union", "enum", "const", "static", "sizeof", "switch", "case", "default",
+]
+
+PROGRAMMING = (
+    [(kw.upper(), kw) for kw in C_KEYWORDS]
+    + [
+        ("ID", f"{LETTER}({LETTER}|{DIGIT})*"),
+        ("NUMBER", f"{DIGIT}+(\\.{DIGIT}+)?"),
+        ("STRING", f'"({LETTER}|{DIGIT}|\\ |,|\\.)*"'),
+        ("COMMENT", "/\\*([a-z]|[A-Z]|\\ |\n)*\\*/"),
+        ("OP", "\\+|\\-|\\*|/|=|==|<|>|<=|>=|!=|&&|\\|\\||!"),
+        ("PUNCT", "\\(|\\)|{|}|;|,|\\[|\\]"),
+        ("SPACE", "(\\ |\t|\n)+"),
+    ]
+)
+
+LOG = [
+    ("TIME", f"{DIGIT}{DIGIT}:{DIGIT}{DIGIT}:{DIGIT}{DIGIT}(\\.{DIGIT}+)?"),
+    ("DATE", f"{DIGIT}{DIGIT}{DIGIT}{DIGIT}\\-{DIGIT}{DIGIT}\\-{DIGIT}{DIGIT}"),
+    ("LEVEL", "DEBUG|INFO|WARN|ERROR"),
+    ("IP", f"{DIGIT}+\\.{DIGIT}+\\.{DIGIT}+\\.{DIGIT}+"),
+    ("NUMBER", f"{DIGIT}+"),
+    ("WORD", "([a-z]|[A-Z]|_|\\-|/)+"),
+    ("BRACKET", "\\[|\\]"),
+    ("PUNCT", ":|=|,|\\.|\\(|\\)"),
+    ("SPACE", "\\ +"),
+    ("NEWLINE", "\n"),
+]
+
+KEYWORDS = [(f"KW{i}", f"kw{i}x") for i in range(60)] + [
+    ("ID", "[a-z]([a-z]|[0-9])*"),
+    ("SPACE", "\\ +"),
+]
+
+WIDE_RANGES = [
+    ("LATIN", "([a-z]|[A-Z]|[À-ɏ])+"),
+    ("GREEK", "[Ͱ-Ͽ]+"),
+    ("CYRILLIC", "[Ѐ-ӿ]+"),
+    ("CJK", "[一-鿿]+"),
+    ("NUMBER", "[0-9]+"),
+    ("SPACE", "\\ +"),
+]
+
+# rule "a" and rule "a*b" on a long run of a: without the linear mode every
+# token rescans the rest of the run looking for the b
+ADVERSARIAL = [
+    ("A", "a"),
+    ("AB", "a*b"),
+]
+
+SPECS = {
+    "programming": PROGRAMMING,
+    "log": LOG,
+    "keywords": KEYWORDS,
+    "wide_ranges": WIDE_RANGES,
+    "adversarial": ADVERSARIAL,
+}
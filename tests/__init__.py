@@ -0,0 +1,7 @@
+"""Tests of the lexer, run from the root of the checkout with
+
+    python -m unittest discover -s tests -t ..
+
+The tests import the lexer through relative imports, so the checkout is
+imported as a package under its directory name.
+"""
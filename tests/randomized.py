@@ -0,0 +1,68 @@
+"""Random specs and inputs, and a maximal munch reference lexer built on `re`."""
+
+from ..Lexer import LexError
+
+import random
+import re
+from collections.abc import Callable, Iterable
+
+GENERATORS = ["[a-c]+", "a(b|c)*", "(a|b)(a|b)", "c+", "[a-b]*c", "d", "\\ ", "(\\\n)+"]
+
+
+class CountingStr(str):
+    """A str that counts the characters read from it one at a time."""
+
+    reads = 0
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            self.reads += 1
+        return super().__getitem__(index)
+
+
+def random_spec(rng: random.Random) -> list[tuple[str, str]]:
+    """Literal rules and overlapping generic rules, in random priority order."""
+    rules = []
+    for _ in range(rng.randint(2, 7)):
+        if rng.random() < 0.5:
+            rules.append("".join(rng.choice("abc") for _ in range(rng.randint(1, 4))))
+        else:
+            rules.append(rng.choice(GENERATORS))
+    return [(f"R{i}", regex) for i, regex in enumerate(rules)]
+
+
+def random_word(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, length)))
+
+
+def reference_lex(
+    spec: list[tuple[str, str]], word: str
+) -> list[tuple[str, str]] | None:
+    """The tokens Lexer.lex should find, or None if no rule matches somewhere."""
+    patterns = [re.compile(regex) for _, regex in spec]
+    tokens = []
+    start = 0
+    while start < len(word):
+        best_rule = -1
+        best_end = start
+        for rule, pattern in enumerate(patterns):
+            for end in range(len(word), best_end, -1):
+                if pattern.fullmatch(word, start, end):
+                    best_rule = rule
+                    best_end = end
+                    break
+        if best_rule < 0:
+            return None
+        tokens.append((spec[best_rule][0], word[start:best_end]))
+        start = best_end
+    return tokens
+
+
+def as_tokens(
+    tokens: Callable[[], Iterable[tuple[str, str]]]
+) -> list[tuple[str, str]]:
+    """The tokens of a raising lexing path, with errors in-band like Lexer.lex."""
+    try:
+        return list(tokens())
+    except LexError as e:
+        return [("", str(e))]
@@ -0,0 +1,84 @@
+from ..Lexer import Lexer, LexError
+from .randomized import as_tokens, random_spec, random_word
+
+import random
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "lex_batch needs NumPy")
+class TestBatch(unittest.TestCase):
+    def test_same_tokens_as_lex_stream(self) -> None:
+        rng = random.Random(24)
+        for _ in range(60):
+            spec = random_spec(rng)
+            lexer = Lexer(spec, skip=[name for name, _ in spec[:1]])
+            documents = [random_word(rng, "abcd \n", 20) for _ in range(8)]
+            documents.append("")
+            for document, result in zip(documents, lexer.lex_batch(documents)):
+                if isinstance(result, LexError):
+                    tokens = [("", str(result))]
+                else:
+                    tokens = list(result)
+                expected = as_tokens(lambda: lexer.lex_stream(document))
+                self.assertEqual(tokens, expected, (lexer.spec, document))
+
+    def test_keywords(self) -> None:
+        spec = [("IF", "if"), ("IN", "in"), ("INT", "int"), ("ID", "[a-z]+")]
+        lexer = Lexer(spec + [("SPACE", "\\ ")], skip=["SPACE"])
+        self.assertTrue(lexer.table.keywords)
+        rng = random.Random(26)
+        words = ["if", "in", "int", "i", "ifs", "nt", "intx", "f"]
+        documents = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+            for _ in range(200)
+        ]
+        for document, result in zip(documents, lexer.lex_batch(documents)):
+            self.assertEqual(list(result), list(lexer.lex_stream(document)))
+
+    def test_columns(self) -> None:
+        lexer = Lexer([("NAME", "[a-z]+"), ("SPACE", "\\ ")], skip=["SPACE"])
+        batch = lexer.lex_batch(["ab c", "", "?", "d"])
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(list(batch.bounds), [0, 2, 2, 2, 3])
+        self.assertEqual(list(batch.rules), [0, 0, 0])
+        self.assertEqual(list(batch.starts), [0, 3, 0])
+        self.assertEqual(list(batch.ends), [2, 4, 1])
+        self.assertEqual(list(batch.errors), [2])
+        self.assertEqual(list(batch[-1]), [("NAME", "d")])
+        self.assertIs(batch[2], batch.errors[2])
+
+    def test_error_fields(self) -> None:
+        lexer = Lexer([("NAME", "[a-z]+"), ("NEWLINE", "\\\n")])
+        ok, error = lexer.lex_batch(["ab\ncd", "ab\nc?"])
+        self.assertEqual(list(ok), [("NAME", "ab"), ("NEWLINE", "\n"), ("NAME", "cd")])
+        self.assertIsInstance(error, LexError)
+        self.assertEqual((error.position, error.line, error.column), (4, 1, 1))
+
+    def test_stats(self) -> None:
+        rng = random.Random(25)
+        spec = random_spec(rng)
+        documents = [random_word(rng, "abcd \n", 20) for _ in range(50)]
+        batch = Lexer(spec, stats=True)
+        batch.lex_batch(documents)
+        loop = Lexer(spec, stats=True)
+        for document in documents:
+            try:
+                loop.lex_stream(document)
+            except LexError:
+                pass
+        for name in ("chars_consumed", "chars_scanned", "chars_rescanned"):
+            self.assertEqual(getattr(batch.stats, name), getattr(loop.stats, name))
+        self.assertEqual(batch.stats.tokens, loop.stats.tokens)
+
+    def test_lazy_lexer(self) -> None:
+        with self.assertRaises(ValueError):
+            Lexer([("A", "a")], lazy=True).lex_batch(["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from .. import Cache
+from ..Lexer import Lexer
+
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+SPEC = [("IF", "if"), ("NAME", "[a-z]+"), ("SPACE", "\\ ")]
+WORD = "if x iff"
+TOKENS = [("IF", "if"), ("SPACE", " "), ("NAME", "x"), ("SPACE", " "), ("NAME", "iff")]
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+        self.path = Cache.cache_path(self.cache_dir, SPEC)
+
+    def compiles(self) -> int:
+        """How many times a Lexer built with the cache compiles its spec."""
+        with mock.patch.object(
+            Lexer, "compile", autospec=True, side_effect=Lexer.compile
+        ) as compile:
+            lexer = Lexer(SPEC, cache_dir=self.cache_dir)
+        self.assertEqual(lexer.lex(WORD), TOKENS)
+        return compile.call_count
+
+    def rewrite(self, change) -> None:
+        with open(self.path, "rb") as f:
+            data = bytearray(f.read())
+        with open(self.path, "wb") as f:
+            f.write(change(data))
+
+    def test_hit(self) -> None:
+        self.assertEqual(self.compiles(), 1)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.compiles(), 0)
+
+    def test_key_depends_on_spec(self) -> None:
+        self.assertNotEqual(Cache.spec_key(SPEC), Cache.spec_key(SPEC[::-1]))
+
+    def test_corrupt_entry_is_recompiled(self) -> None:
+        self.compiles()
+
+        def flip_last_byte(data: bytearray) -> bytearray:
+            data[-1] ^= 0xFF
+            return data
+
+        self.rewrite(flip_last_byte)
+        self.assertEqual(self.compiles(), 1)
+        # the bad entry was replaced
+        self.assertEqual(self.compiles(), 0)
+
+    def test_truncated_entry_is_recompiled(self) -> None:
+        self.compiles()
+        self.rewrite(lambda data: data[:10])
+        self.assertEqual(self.compiles(), 1)
+
+    def test_version_mismatch_is_recompiled(self) -> None:
+        self.compiles()
+
+        def bump_version(data: bytearray) -> bytearray:
+            struct.pack_into("<H", data, 5, Cache.FORMAT_VERSION + 1)
+            return data
+
+        self.rewrite(bump_version)
+        self.assertEqual(self.compiles(), 1)
+
+    def test_unwritable_cache_dir(self) -> None:
+        path = os.path.join(self.cache_dir, "file")
+        with open(path, "w"):
+            pass
+        lexer = Lexer(SPEC, cache_dir=os.path.join(path, "cache"))
+        self.assertEqual(lexer.lex(WORD), TOKENS)
+
+
+if __name__ == "__main__":
+    unittest.main()
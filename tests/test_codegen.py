@@ -0,0 +1,35 @@
+from ..Codegen import generate_module
+from ..Lexer import Lexer
+from .randomized import random_spec, random_word
+
+import random
+import unittest
+
+
+def load(lexer: Lexer) -> dict:
+    namespace: dict = {}
+    exec(compile(generate_module(lexer), "<generated>", "exec"), namespace)
+    return namespace
+
+
+class TestCodegen(unittest.TestCase):
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(16)
+        for _ in range(60):
+            lexer = Lexer(random_spec(rng))
+            lex = load(lexer)["lex"]
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 30)
+                self.assertEqual(lex(word), lexer.lex(word), (lexer.spec, word))
+
+    def test_instrumented_lexer(self) -> None:
+        lexer = Lexer([("A", "a+"), ("B", "b")], stats=True)
+        self.assertEqual(load(lexer)["lex"]("aab"), [("A", "aa"), ("B", "b")])
+
+    def test_lazy_lexer(self) -> None:
+        with self.assertRaises(ValueError):
+            generate_module(Lexer([("A", "a")], lazy=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
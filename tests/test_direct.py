@@ -0,0 +1,43 @@
+from ..Lexer import Lexer
+from ..Regex import Regex
+from .randomized import random_spec, random_word
+from .test_minimize import moore_blocks
+from .test_parser import random_regex
+
+import random
+import unittest
+from unittest import mock
+
+
+class TestDirect(unittest.TestCase):
+    def test_same_table_as_nfa_path(self) -> None:
+        rng = random.Random(19)
+        for _ in range(200):
+            spec = random_spec(rng)
+            self.assertEqual(
+                Lexer(spec, direct=True).table.to_bytes(),
+                Lexer(spec).table.to_bytes(),
+                spec,
+            )
+
+    def test_same_tokens_as_nfa_path(self) -> None:
+        rng = random.Random(20)
+        for _ in range(100):
+            spec = [(f"R{i}", random_regex(rng)) for i in range(rng.randint(1, 4))]
+            nfa = Lexer(spec)
+            direct = Lexer(spec, direct=True)
+            self.assertEqual(moore_blocks(direct.table), direct.table.n_states)
+            for _ in range(5):
+                word = random_word(rng, "abcd(*", 12)
+                self.assertEqual(direct.lex(word), nfa.lex(word), (spec, word))
+
+    def test_no_thompson_nfa(self) -> None:
+        spec = [("IF", "if"), ("ID", "[a-z]+"), ("PLUS", "\\+"), ("SPACE", "\\ ")]
+        with mock.patch.object(Regex, "thompson", side_effect=AssertionError):
+            lexer = Lexer(spec, direct=True)
+        self.assertEqual(lexer.table.keywords, {"if": 0})
+        self.assertEqual(lexer.lex("if+iff"), Lexer(spec).lex("if+iff"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+from ..FragmentCache import FragmentCache
+from ..Lexer import Lexer
+from .randomized import random_spec, random_word
+
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TestFragmentCache(unittest.TestCase):
+    def test_same_lexers_as_without_cache(self) -> None:
+        rng = random.Random(25)
+        fragments = FragmentCache()
+        for _ in range(60):
+            spec = random_spec(rng)
+            for options in ({}, {"direct": True}, {"lazy": True}):
+                lexer = Lexer(spec, fragments=fragments, **options)
+                plain = Lexer(spec, **options)
+                if not options.get("lazy"):
+                    self.assertEqual(lexer.table.to_bytes(), plain.table.to_bytes())
+                word = random_word(rng, "abcd \n", 20)
+                self.assertEqual(lexer.lex(word), plain.lex(word), (spec, word))
+        self.assertGreater(fragments.hits, 0)
+
+    def test_hits_and_misses(self) -> None:
+        fragments = FragmentCache()
+        Lexer([("A", "a+"), ("B", "b")], fragments=fragments)
+        self.assertEqual(fragments.hits, 0)
+        misses = fragments.misses
+        self.assertGreater(misses, 0)
+        Lexer([("A", "a+"), ("C", "c")], fragments=fragments)
+        self.assertGreater(fragments.hits, 0)
+        self.assertIs(fragments.regex("a+"), fragments.regex("a+"))
+        self.assertIs(fragments.nfa("b"), fragments.nfa("b"))
+
+        fragments.clear()
+        self.assertEqual((len(fragments), fragments.hits, fragments.misses), (0, 0, 0))
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        fragments = FragmentCache(max_size=2)
+        fragments.regex("a")
+        fragments.regex("b")
+        fragments.regex("a")
+        fragments.regex("c")
+        self.assertEqual(len(fragments), 2)
+        misses = fragments.misses
+        fragments.regex("a")
+        fragments.regex("c")
+        self.assertEqual(fragments.misses, misses)
+        fragments.regex("b")
+        self.assertEqual(fragments.misses, misses + 1)
+
+    def test_threads(self) -> None:
+        rng = random.Random(26)
+        specs = [random_spec(rng) for _ in range(40)]
+        words = [random_word(rng, "abcd \n", 20) for _ in specs]
+        fragments = FragmentCache(max_size=8)
+
+        def lex(i: int) -> list[tuple[str, str]] | None:
+            return Lexer(specs[i], fragments=fragments).lex(words[i])
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lex, range(len(specs))))
+        for spec, word, tokens in zip(specs, words, results):
+            self.assertEqual(tokens, Lexer(spec).lex(word), (spec, word))
+        self.assertLessEqual(len(fragments), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
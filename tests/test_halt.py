@@ -0,0 +1,31 @@
+from ..Lexer import Lexer
+from .randomized import CountingStr
+
+import unittest
+
+
+class TestHalt(unittest.TestCase):
+    def test_complete_tokens_read_no_further(self) -> None:
+        word = CountingStr("==+" * 100)
+        lexer = Lexer([("EQ", "=="), ("ASSIGN", "="), ("PLUS", "\\+")])
+        self.assertEqual(len(lexer.lex(word)), 200)
+        self.assertEqual(word.reads, len(word))
+
+    def test_growing_tokens_read_one_more(self) -> None:
+        word = CountingStr("ab " * 100)
+        lexer = Lexer([("WORD", "[a-z]+"), ("SPACE", "\\ ")])
+        self.assertEqual(len(lexer.lex(word)), 200)
+        self.assertEqual(word.reads, len(word) + 100)
+
+    def test_halt_flags(self) -> None:
+        table = Lexer([("EQ", "=="), ("WORD", "[a-z]+")]).table
+        for state in range(table.n_states):
+            rule = table.accept[state]
+            if rule == 0:
+                self.assertTrue(table.halt[state])
+            elif rule == 1:
+                self.assertFalse(table.halt[state])
+
+
+if __name__ == "__main__":
+    unittest.main()
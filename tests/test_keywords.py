@@ -0,0 +1,84 @@
+from ..Codegen import generate_module
+from ..Lexer import Lexer
+from .randomized import random_spec, random_word, reference_lex
+
+import random
+import time
+import unittest
+from unittest import mock
+
+WORD = "if iff x"
+
+
+def lexers(spec: list[tuple[str, str]]) -> list:
+    """The lex functions of every backend for `spec`."""
+    namespace: dict = {}
+    exec(generate_module(Lexer(spec)), namespace)
+    return [
+        Lexer(spec).lex,
+        Lexer(spec, direct=True).lex,
+        Lexer(spec, lazy=True).lex,
+        namespace["lex"],
+    ]
+
+
+class TestKeywords(unittest.TestCase):
+    def test_keyword_before_identifier(self) -> None:
+        spec = [("IF", "if"), ("ID", "[a-z]+"), ("SPACE", "\\ ")]
+        table = Lexer(spec).table
+        self.assertEqual(table.keywords, {"if": 0})
+        self.assertEqual(table.keyword_rules, {1})
+        expected = [
+            ("IF", "if"),
+            ("SPACE", " "),
+            ("ID", "iff"),
+            ("SPACE", " "),
+            ("ID", "x"),
+        ]
+        for lex in lexers(spec):
+            self.assertEqual(lex(WORD), expected)
+
+    def test_keyword_after_identifier(self) -> None:
+        spec = [("ID", "[a-z]+"), ("IF", "if"), ("SPACE", "\\ ")]
+        self.assertEqual(Lexer(spec).table.keywords, {})
+        for lex in lexers(spec):
+            self.assertEqual(lex(WORD)[0], ("ID", "if"))
+
+    def test_unmatched_literal_stays_in_table(self) -> None:
+        spec = [("IF", "if"), ("PLUS", "\\+"), ("ID", "[a-z]+")]
+        self.assertEqual(Lexer(spec).table.keywords, {"if": 0})
+        for lex in lexers(spec):
+            self.assertEqual(lex("if+a"), [("IF", "if"), ("PLUS", "+"), ("ID", "a")])
+
+    def test_nfas_timed_as_thompson(self) -> None:
+        thompson = Lexer._thompson
+
+        def slow_thompson(*args):
+            time.sleep(0.01)
+            return thompson(*args)
+
+        spec = [("IF", "if"), ("ID", "[a-z]+"), ("NUM", "[0-9]+")]
+        with mock.patch.object(Lexer, "_thompson", autospec=True) as patched:
+            patched.side_effect = slow_thompson
+            seconds = Lexer(spec, stats=True).stats.compile_seconds
+        self.assertEqual(patched.call_count, 2)
+        self.assertGreaterEqual(seconds["thompson"], 0.02)
+        self.assertLess(seconds["keywords"], 0.01)
+
+    def test_same_tokens_as_re(self) -> None:
+        rng = random.Random(20)
+        for _ in range(60):
+            spec = random_spec(rng)
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 20)
+                expected = reference_lex(spec, word)
+                for lex in lexers(spec):
+                    tokens = lex(word)
+                    if expected is None:
+                        self.assertEqual(tokens[0][0], "", (spec, word))
+                    else:
+                        self.assertEqual(tokens, expected, (spec, word))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+from ..Lexer import Lexer
+from .randomized import as_tokens, random_spec, random_word
+
+import os
+import random
+import tempfile
+import unittest
+
+
+class TestLazy(unittest.TestCase):
+    def test_same_tokens_as_compiled(self) -> None:
+        rng = random.Random(10)
+        for _ in range(60):
+            spec = random_spec(rng)
+            compiled = Lexer(spec)
+            lazy_lexers = [Lexer(spec, lazy=True, max_states=n) for n in (3, 10000)]
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 30)
+                expected = compiled.lex(word)
+                for lazy in lazy_lexers:
+                    self.assertEqual(lazy.lex(word), expected, (spec, word))
+                    self.assertEqual(lazy.lex(word, linear=True), expected)
+                    self.assertEqual(as_tokens(lambda: lazy.lex_iter(word)), expected)
+
+    def test_lex_file(self) -> None:
+        rng = random.Random(11)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input")
+            for _ in range(30):
+                spec = random_spec(rng)
+                word = random_word(rng, "abcd \n", 30)
+                with open(path, "w") as f:
+                    f.write(word)
+                expected = as_tokens(lambda: Lexer(spec).lex_file(path))
+                lazy = Lexer(spec, lazy=True, max_states=3)
+                self.assertEqual(as_tokens(lambda: lazy.lex_file(path)), expected)
+
+    def test_cache_is_bounded(self) -> None:
+        lexer = Lexer([("A", "(a|b)*a(a|b)(a|b)(a|b)")], lazy=True, max_states=5)
+        rng = random.Random(0)
+        for _ in range(20):
+            word = random_word(rng, "ab", 200)
+            lexer.lex(word)
+            self.assertLessEqual(len(lexer.table.masks), 5)
+        self.assertGreater(lexer.table.flushes, 0)
+
+    def test_scans_use_the_cache(self) -> None:
+        for linear in (False, True):
+            lexer = Lexer([("A", "a*b"), ("B", "b")], lazy=True)
+            self.assertEqual(len(lexer.table.masks), 2)
+            lexer.lex("aab" * 10, linear=linear)
+            self.assertGreater(len(lexer.table.masks), 2)
+
+    def test_thrashing_is_retried(self) -> None:
+        lexer = Lexer([("A", "a")], lazy=True, max_states=3)
+        table = lexer.table
+        table.thrashing = True
+        self.assertEqual(lexer.lex("a" * table.window), [("A", "a")] * table.window)
+        self.assertEqual(len(table.masks), 2)
+        self.assertEqual(lexer.lex("aa"), [("A", "a")] * 2)
+        self.assertFalse(table.thrashing)
+        self.assertEqual(len(table.masks), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+from ..Lexer import Lexer, LexError
+from .randomized import as_tokens, random_spec, random_word
+
+import os
+import random
+import tempfile
+import unittest
+from collections.abc import Iterator
+
+
+class TestLexFile(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "input")
+
+    def write(self, data: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def file_tokens(self, lexer: Lexer, word: str) -> Iterator[tuple[str, str]]:
+        data = word.encode()
+        self.write(data)
+        for name, start, end in lexer.lex_file(self.path):
+            yield name, data[start:end].decode()
+
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(8)
+        for _ in range(60):
+            lexer = Lexer(random_spec(rng))
+            word = random_word(rng, "abcd \n", 30)
+            self.assertEqual(
+                as_tokens(lambda: self.file_tokens(lexer, word)),
+                lexer.lex(word),
+                (lexer.spec, word),
+            )
+
+    def test_empty_file(self) -> None:
+        self.write(b"")
+        self.assertEqual(list(Lexer([("A", "a")]).lex_file(self.path)), [])
+
+    def test_error_position(self) -> None:
+        self.write(b"aa\na\nab")
+        tokens = Lexer([("A", "a+"), ("NEWLINE", "\\\n")]).lex_file(self.path)
+        with self.assertRaises(LexError) as raised:
+            list(tokens)
+        error = raised.exception
+        self.assertEqual((error.position, error.line, error.column), (6, 2, 1))
+        self.assertFalse(error.eof)
+
+
+if __name__ == "__main__":
+    unittest.main()
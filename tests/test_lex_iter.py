@@ -0,0 +1,68 @@
+from ..Lexer import Lexer, LexError
+from .randomized import as_tokens, random_spec, random_word
+
+import io
+import random
+import unittest
+
+
+class TestLexIter(unittest.TestCase):
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(7)
+        for _ in range(100):
+            lexer = Lexer(random_spec(rng))
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 30)
+                expected = lexer.lex(word)
+                for size in (1, 3, 64):
+                    chunks = [word[i : i + size] for i in range(0, len(word), size)]
+                    self.assertEqual(
+                        as_tokens(lambda: lexer.lex_iter(iter(chunks))),
+                        expected,
+                        (lexer.spec, word, size),
+                    )
+                self.assertEqual(as_tokens(lambda: lexer.lex_iter(word)), expected)
+                self.assertEqual(
+                    as_tokens(lambda: lexer.lex_iter(io.StringIO(word), 2)), expected
+                )
+
+    def test_token_across_chunks(self) -> None:
+        lexer = Lexer([("WORD", "[a-z]+"), ("SPACE", "\\ ")])
+        text = "ab " + "x" * 1000 + " cd"
+        tokens = list(lexer.lex_iter(io.StringIO(text), 7))
+        self.assertEqual(
+            tokens,
+            [("WORD", "ab"), ("SPACE", " "), ("WORD", "x" * 1000)]
+            + [("SPACE", " "), ("WORD", "cd")],
+        )
+
+    def test_long_token_scanned_once(self) -> None:
+        spec = [("WORD", "[a-z]+"), ("SPACE", "\\ ")]
+        text = "x" * 5000 + " ab"
+        chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+        for lazy in (False, True):
+            lexer = Lexer(spec, lazy=lazy, stats=True)
+            tokens = list(lexer.lex_iter(iter(chunks)))
+            self.assertEqual(
+                tokens, [("WORD", "x" * 5000), ("SPACE", " "), ("WORD", "ab")]
+            )
+            self.assertEqual(lexer.stats.chars_scanned, len(text) + 1)
+            self.assertEqual(lexer.stats.tokens_per_rule()["WORD"], 2)
+
+    def test_error_after_tokens(self) -> None:
+        lexer = Lexer([("WORD", "[a-z]+"), ("NEWLINE", "\\\n")])
+        tokens = lexer.lex_iter(iter(["ab\nc", "d\n", "e1"]))
+        self.assertEqual(next(tokens), ("WORD", "ab"))
+        self.assertEqual(next(tokens), ("NEWLINE", "\n"))
+        self.assertEqual(next(tokens), ("WORD", "cd"))
+        self.assertEqual(next(tokens), ("NEWLINE", "\n"))
+        self.assertEqual(next(tokens), ("WORD", "e"))
+        with self.assertRaises(LexError) as raised:
+            next(tokens)
+        error = raised.exception
+        self.assertEqual((error.position, error.line, error.column), (7, 2, 1))
+        self.assertFalse(error.eof)
+
+
+if __name__ == "__main__":
+    unittest.main()
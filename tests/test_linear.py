@@ -0,0 +1,32 @@
+from ..Lexer import Lexer
+from .randomized import CountingStr, random_spec, random_word
+
+import random
+import unittest
+
+
+class TestLinear(unittest.TestCase):
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(6)
+        for _ in range(100):
+            lexer = Lexer(random_spec(rng))
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 30)
+                self.assertEqual(
+                    lexer.lex(word, linear=True), lexer.lex(word), (lexer.spec, word)
+                )
+
+    def test_reads_are_linear(self) -> None:
+        lexer = Lexer([("A", "a"), ("AB", "a*b")])
+        for n in (100, 1000):
+            word = CountingStr("a" * n)
+            self.assertEqual(lexer.lex(word, linear=True), [("A", "a")] * n)
+            self.assertLessEqual(word.reads, 3 * n)
+
+            word = CountingStr("a" * n)
+            lexer.lex(word)
+            self.assertGreater(word.reads, n * n // 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+from ..Lexer import Lexer
+from .randomized import random_spec, random_word, reference_lex
+
+import random
+import unittest
+
+
+def moore_blocks(table) -> int:
+    """Number of states of the minimal DFA equivalent to a CompiledDFA."""
+    n = table.n_classes
+    blocks = list(table.accept)
+    count = len(set(blocks))
+    while True:
+        signatures: dict[tuple, int] = {}
+        refined = []
+        for state in range(table.n_states):
+            row = table.d[state * n : (state + 1) * n]
+            key = (blocks[state], *(blocks[target] for target in row))
+            refined.append(signatures.setdefault(key, len(signatures)))
+        if len(signatures) == count:
+            return count
+        blocks = refined
+        count = len(signatures)
+
+
+class TestMinimize(unittest.TestCase):
+    def test_table_is_minimal(self) -> None:
+        rng = random.Random(2)
+        for _ in range(100):
+            spec = random_spec(rng)
+            table = Lexer(spec).table
+            self.assertEqual(moore_blocks(table), table.n_states, spec)
+
+    def test_first_rule_wins(self) -> None:
+        rng = random.Random(3)
+        for _ in range(100):
+            spec = random_spec(rng)
+            lexer = Lexer(spec)
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 20)
+                expected = reference_lex(spec, word)
+                tokens = lexer.lex(word)
+                if expected is None:
+                    self.assertEqual(len(tokens), 1, (spec, word))
+                    self.assertEqual(tokens[0][0], "", (spec, word))
+                else:
+                    self.assertEqual(tokens, expected, (spec, word))
+
+    def test_select_match(self) -> None:
+        lexer = Lexer([("EQ", "=="), ("ASSIGN", "="), ("NAME", "[a-z]+")])
+        table = lexer.table
+        self.assertIsNone(lexer.select_match(table.q0))
+        state = table.step(table.q0, "=")
+        self.assertEqual(lexer.select_match(state), "ASSIGN")
+        self.assertEqual(lexer.select_match(table.step(state, "=")), "EQ")
+        self.assertEqual(lexer.select_match(table.step(table.q0, "x")), "NAME")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+from ..Lexer import Lexer
+from .randomized import random_spec, random_word
+
+import random
+import unittest
+
+
+class TestParallel(unittest.TestCase):
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(11)
+        for _ in range(3):
+            lexer = Lexer(random_spec(rng))
+            for _ in range(4):
+                word = random_word(rng, "abcd \n", 200)
+                for overlap in (1, 4, 1 << 12):
+                    self.assertEqual(
+                        lexer.lex_parallel(
+                            word, workers=2, chunk_size=8, overlap=overlap
+                        ),
+                        lexer.lex(word),
+                        (lexer.spec, word, overlap),
+                    )
+
+    def test_tokens_across_chunks(self) -> None:
+        lexer = Lexer([("WORD", "[a-z]+"), ("SPACE", "\\ +")])
+        word = " ".join("x" * n for n in range(1, 40))
+        for overlap in (1, 4, 1 << 12):
+            self.assertEqual(
+                lexer.lex_parallel(word, workers=2, chunk_size=8, overlap=overlap),
+                lexer.lex(word),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
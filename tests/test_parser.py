@@ -0,0 +1,85 @@
+from ..Lexer import Lexer
+from ..Regex import parse_regex
+from .randomized import random_word, reference_lex
+
+import random
+import re
+import unittest
+
+ATOMS = ["a", "b", "c", "[a-c]", "[b-d]", "\\(", "\\*"]
+
+
+def random_regex(rng: random.Random, depth: int = 3) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 3)):
+        if depth and rng.random() < 0.4:
+            inner = random_regex(rng, depth - 1)
+            if rng.random() < 0.5:
+                inner += "|" + random_regex(rng, depth - 1)
+            parts.append(f"({inner}){rng.choice('*+?')}")
+        else:
+            parts.append(rng.choice(ATOMS))
+    return "".join(parts)
+
+
+class TestParser(unittest.TestCase):
+    # `re` is the oracle for the language of each parsed regex
+
+    def test_thompson_matches_re(self) -> None:
+        rng = random.Random(18)
+        for _ in range(200):
+            regex = random_regex(rng)
+            pattern = re.compile(regex)
+            dfa = parse_regex(regex).thompson().subset_construction()
+            for _ in range(10):
+                word = random_word(rng, "abcd(*", 6)
+                self.assertEqual(
+                    dfa.accept(word),
+                    pattern.fullmatch(word) is not None,
+                    (regex, word),
+                )
+
+    def test_ranges_match_re(self) -> None:
+        rng = random.Random(20)
+        for _ in range(200):
+            regex = random_regex(rng)
+            pattern = re.compile(regex)
+            nfa = parse_regex(regex).thompson(ranges=True)
+            words = [random_word(rng, "abcd(*", 6) for _ in range(10)]
+            accepted = [bool(states & nfa.F) for states in nfa.read(words)]
+            expected = [pattern.fullmatch(word) is not None for word in words]
+            self.assertEqual(accepted, expected, (regex, words))
+
+    def test_lexer_matches_re(self) -> None:
+        rng = random.Random(19)
+        for _ in range(100):
+            spec = [(f"R{i}", random_regex(rng)) for i in range(rng.randint(1, 3))]
+            lexer = Lexer(spec)
+            for _ in range(5):
+                word = random_word(rng, "abcd(*", 10)
+                expected = reference_lex(spec, word)
+                tokens = lexer.lex(word)
+                if expected is None:
+                    self.assertEqual(tokens[0][0], "", (spec, word))
+                else:
+                    self.assertEqual(tokens, expected, (spec, word))
+
+    def test_simplified_tree(self) -> None:
+        # stacked repeats collapse and classes fold into one node
+        self.assertEqual(
+            len(parse_regex("((a*)+)?").thompson().K),
+            len(parse_regex("a*").thompson().K),
+        )
+        self.assertEqual(
+            len(parse_regex("a|b|[c-d]|a").thompson().K),
+            len(parse_regex("[a-d]").thompson().K),
+        )
+
+    def test_deeply_nested_groups(self) -> None:
+        regex = "(" * 3000 + "a" + ")*" * 3000
+        self.assertEqual(Lexer([("A", regex)]).lex("aa"), [("A", "aa")])
+        self.assertEqual(Lexer([("A", regex)], direct=True).lex("a"), [("A", "a")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+from ..LineIndex import LineIndex
+from ..Lexer import Lexer, LexError
+from .randomized import random_word
+
+import os
+import random
+import tempfile
+import unittest
+
+SPEC = [("NAME", "[a-z]+"), ("SPACE", "\\ "), ("NEWLINE", "\\\n")]
+
+
+def naive_position(text: str, offset: int) -> tuple[int, int]:
+    line = text.count("\n", 0, offset)
+    return line, offset - (text.rfind("\n", 0, offset) + 1)
+
+
+class TestLineIndex(unittest.TestCase):
+    def test_same_as_counting(self) -> None:
+        rng = random.Random(23)
+        for _ in range(100):
+            text = random_word(rng, "ab\n", 40)
+            offsets = [rng.randint(0, len(text)) for _ in range(10)]
+            index = LineIndex(text)
+            data = LineIndex(text.encode())
+            for offset in offsets:
+                expected = naive_position(text, offset)
+                self.assertEqual(index.position(offset), expected, (text, offset))
+                self.assertEqual(data.position(offset), expected, (text, offset))
+
+    def test_token_positions(self) -> None:
+        stream = Lexer(SPEC).lex_stream("ab cd\n\nef\ng")
+        positions = [stream.position(i) for i in range(len(stream))]
+        self.assertEqual(
+            positions,
+            [(0, 0), (0, 2), (0, 3), (0, 5), (1, 0), (2, 0), (2, 2), (3, 0)],
+        )
+        self.assertEqual(stream[5:].position(0), (2, 0))
+
+
+class TestErrorPositions(unittest.TestCase):
+    def raised(self, f) -> LexError:
+        with self.assertRaises(LexError) as raised:
+            f()
+        return raised.exception
+
+    def check(
+        self, text: str, position: int, line: int, column: int, spec=SPEC
+    ) -> None:
+        lexer = Lexer(spec)
+        eof = position == len(text)
+        character = "EOF" if eof else column
+        message = f"No viable alternative at character {character}, line {line}"
+        self.assertEqual(lexer.lex(text), [("", message)])
+
+        errors = [
+            self.raised(lambda: lexer.lex_stream(text)),
+            self.raised(lambda: lexer.count(text)),
+            self.raised(lambda: lexer.lex_spans(text)),
+            self.raised(lambda: list(lexer.lex_iter(text))),
+            self.raised(lambda: list(lexer.lex_iter(iter(text)))),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input")
+            with open(path, "w") as f:
+                f.write(text)
+            errors.append(self.raised(lambda: list(lexer.lex_file(path))))
+        for error in errors:
+            self.assertEqual(str(error), message)
+            self.assertEqual(
+                (error.position, error.line, error.column, error.eof),
+                (position, line, column, eof),
+            )
+
+    def test_first_line(self) -> None:
+        self.check("ab?", 2, 0, 2)
+
+    def test_later_line(self) -> None:
+        self.check("ab\ncd\n e?f", 8, 2, 2)
+
+    def test_after_newline(self) -> None:
+        self.check("ab\n\n?", 4, 2, 0)
+
+    def test_eof(self) -> None:
+        self.check("ab\na", 4, 1, 1, [("AB", "ab"), ("NEWLINE", "\\\n")])
+
+
+if __name__ == "__main__":
+    unittest.main()
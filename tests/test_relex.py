@@ -0,0 +1,69 @@
+from ..Lexer import Lexer, LexError
+from ..Spans import Spans
+from .randomized import CountingStr, random_spec, random_word
+
+import random
+import unittest
+
+
+class TestRelex(unittest.TestCase):
+    def test_same_spans_as_lex_spans(self) -> None:
+        rng = random.Random(12)
+        edits = 0
+        while edits < 300:
+            lexer = Lexer(random_spec(rng))
+            word = random_word(rng, "abcd \n", 40)
+            try:
+                spans = lexer.lex_spans(word)
+            except LexError:
+                continue
+            for _ in range(10):
+                offset = rng.randint(0, len(word))
+                deleted = rng.randint(0, min(3, len(word) - offset))
+                inserted = random_word(rng, "abc ", 3)
+                edited = word[:offset] + inserted + word[offset + deleted :]
+                try:
+                    expected = list(lexer.lex_spans(edited))
+                except LexError:
+                    continue
+                before = list(spans)
+                changed = lexer.relex(edited, spans, offset, deleted, inserted)
+                self.assertEqual(list(spans), expected, (lexer.spec, word, edited))
+                self.assertEqual(before[: changed.start], expected[: changed.start])
+                word = edited
+                edits += 1
+
+    def test_edit_is_lexed_locally(self) -> None:
+        lexer = Lexer([("WORD", "[a-z]+"), ("SPACE", "\\ ")])
+        word = "ab " * 1000
+        spans = lexer.lex_spans(word)
+        offset = len(word) // 2
+        edited = CountingStr(word[:offset] + "xyz " + word[offset:])
+        changed = lexer.relex(edited, spans, offset, 0, "xyz ")
+        self.assertLess(edited.reads, 20)
+        self.assertLess(len(changed), 5)
+        self.assertEqual(list(spans), list(lexer.lex_spans(edited)))
+
+    def test_spans(self) -> None:
+        spans = Spans([("A", 0, 1, 1), ("B", 1, 2, 2), ("C", 2, 3, 3)])
+        spans.splice(1, 2, [("D", 1, 3, 3)], 1)
+        self.assertEqual(
+            list(spans), [("A", 0, 1, 1), ("D", 1, 3, 3), ("C", 3, 4, 4)]
+        )
+        # the shift of the tail is only applied as later edits move past it
+        self.assertEqual(spans.spans[2], ("C", 2, 3, 3))
+        spans.splice(0, 1, [], -1)
+        self.assertEqual(list(spans), [("D", 0, 2, 2), ("C", 2, 3, 3)])
+        spans.splice(2, 2, [("E", 3, 4, 4)], 1)
+        self.assertEqual(spans[-1], ("E", 3, 4, 4))
+        self.assertEqual(len(spans), 3)
+
+    def test_error(self) -> None:
+        lexer = Lexer([("WORD", "[a-z]+"), ("SPACE", "\\ ")])
+        spans = lexer.lex_spans("ab cd")
+        with self.assertRaises(LexError):
+            lexer.relex("ab 1d", spans, 3, 1, "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+from ..Codegen import generate_module
+from ..Lexer import Lexer, LexError
+from .randomized import as_tokens, random_spec, random_word
+
+import os
+import random
+import tempfile
+import unittest
+from collections.abc import Iterator
+
+SPEC = [("NAME", "[a-z]+"), ("SPACE", "\\ +"), ("NEWLINE", "\\\n"), ("NAME", "[0-9]+")]
+
+
+class TestSkip(unittest.TestCase):
+    def test_skipped_tokens_are_dropped(self) -> None:
+        rng = random.Random(22)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input")
+
+            def file_tokens(lexer: Lexer, word: str) -> Iterator[tuple[str, str]]:
+                with open(path, "w") as f:
+                    f.write(word)
+                for name, start, end in lexer.lex_file(path):
+                    yield name, word[start:end]
+
+            for _ in range(30):
+                spec = random_spec(rng)
+                names = {name for name, _ in rng.sample(spec, rng.randint(1, 2))}
+                full = Lexer(spec)
+                lexer = Lexer(spec, skip=names)
+                namespace: dict = {}
+                exec(generate_module(lexer), namespace)
+                for _ in range(3):
+                    word = random_word(rng, "abcd \n", 30)
+                    tokens = full.lex(word)
+                    if tokens and tokens[0][0] != "":
+                        tokens = [token for token in tokens if token[0] not in names]
+                    self.assertEqual(lexer.lex(word), tokens, (spec, names, word))
+                    self.assertEqual(namespace["lex"](word), tokens)
+                    self.assertEqual(as_tokens(lambda: lexer.lex_stream(word)), tokens)
+                    self.assertEqual(as_tokens(lambda: lexer.lex_iter(word)), tokens)
+                    self.assertEqual(
+                        lexer.lex_parallel(word, workers=2, chunk_size=8), tokens
+                    )
+                    self.assertEqual(
+                        as_tokens(lambda: file_tokens(lexer, word)), tokens
+                    )
+
+    def test_spans_keep_skipped_tokens(self) -> None:
+        lexer = Lexer(SPEC, skip=["SPACE"])
+        spans = lexer.lex_spans("ab  c")
+        self.assertEqual([span[0] for span in spans], ["NAME", "SPACE", "NAME"])
+
+    def test_unknown_rule(self) -> None:
+        with self.assertRaises(ValueError):
+            Lexer(SPEC, skip=["COMMENT"])
+
+    def test_count(self) -> None:
+        lexer = Lexer(SPEC, skip=["SPACE"])
+        counts = lexer.count("ab 12\ncd  e\n")
+        self.assertEqual(counts, {"NAME": 4, "SPACE": 2, "NEWLINE": 2})
+        self.assertEqual(lexer.count(""), {"NAME": 0, "SPACE": 0, "NEWLINE": 0})
+        with self.assertRaises(LexError) as raised:
+            lexer.count("ab\n?")
+        self.assertEqual(str(raised.exception), lexer.lex("ab\n?")[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
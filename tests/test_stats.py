@@ -0,0 +1,79 @@
+from ..Lexer import Lexer
+
+import json
+import tempfile
+import unittest
+
+SPEC = [("A", "a"), ("AB", "a*b"), ("SPACE", "\\ ")]
+
+
+class TestStats(unittest.TestCase):
+    def test_off_by_default(self) -> None:
+        lexer = Lexer(SPEC)
+        self.assertIsNone(lexer.stats)
+        self.assertNotIn("lex", vars(lexer))
+
+    def test_compile(self) -> None:
+        lexer = Lexer(SPEC, stats=True)
+        stats = lexer.stats
+        for phase in ("parse_regex", "thompson", "subset_construction"):
+            self.assertGreaterEqual(stats.compile_seconds[phase], 0)
+        self.assertGreater(stats.nfa_states, 0)
+        self.assertGreater(stats.dfa_states, 0)
+        self.assertEqual(stats.table_states, lexer.table.table.n_states)
+        self.assertEqual(stats.table_columns, lexer.table.n_classes)
+
+    def test_scans(self) -> None:
+        lexer = Lexer(SPEC, stats=True)
+        self.assertEqual(lexer.lex("aaa"), [("A", "a")] * 3)
+        stats = lexer.stats
+        self.assertEqual(stats.lex_calls, 1)
+        self.assertEqual(stats.tokens_per_rule(), {"A": 3, "AB": 0, "SPACE": 0})
+        self.assertEqual(stats.chars_consumed, 3)
+        # every "a" scan reads to the end, in case an "ab" follows
+        self.assertEqual(stats.chars_scanned, 3 + 2 + 1)
+        self.assertEqual(stats.chars_rescanned, 2 + 1)
+
+        lexer.lex_stream("aa")
+        self.assertEqual(stats.lex_calls, 2)
+        self.assertEqual(stats.tokens_per_rule()["A"], 5)
+        self.assertEqual(stats.chars_scanned, 6 + 3)
+        # the scan of the first "a" is resumed once the second one is read
+        list(lexer.lex_iter(iter(["a", "a"])))
+        self.assertEqual(stats.lex_calls, 3)
+        self.assertEqual(stats.tokens_per_rule()["A"], 7)
+        self.assertEqual(stats.chars_scanned, 9 + 3)
+
+        stats.reset_lex()
+        self.assertEqual(stats.lex_calls, 0)
+        self.assertEqual(stats.chars_scanned, 0)
+        self.assertEqual(stats.tokens_per_rule(), {"A": 0, "AB": 0, "SPACE": 0})
+
+    def test_linear_scans(self) -> None:
+        word = "a" * 2000
+        plain = Lexer(SPEC, stats=True)
+        linear = Lexer(SPEC, stats=True)
+        self.assertEqual(linear.lex(word, linear=True), plain.lex(word))
+        self.assertEqual(plain.stats.chars_scanned, 2000 * 2001 // 2)
+        # later scans stop at the memoized pair after their second character
+        self.assertEqual(linear.stats.chars_scanned, 2000 + 2 * 1998 + 1)
+        self.assertEqual(linear.stats.tokens_per_rule()["A"], 2000)
+
+    def test_as_dict(self) -> None:
+        lexer = Lexer(SPEC, stats=True)
+        lexer.lex_stream("ab a")
+        values = json.loads(json.dumps(lexer.stats.as_dict()))
+        self.assertEqual(values["tokens_per_rule"], {"A": 1, "AB": 1, "SPACE": 1})
+        self.assertEqual(values["lex_calls"], 1)
+
+    def test_cache_load(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            Lexer(SPEC, cache_dir=cache_dir)
+            lexer = Lexer(SPEC, cache_dir=cache_dir, stats=True)
+        self.assertIn("cache_load", lexer.stats.compile_seconds)
+        self.assertNotIn("thompson", lexer.stats.compile_seconds)
+        self.assertEqual(lexer.lex("ab"), [("AB", "ab")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+from ..Lexer import Lexer
+from .randomized import as_tokens, random_spec, random_word
+
+import random
+import unittest
+
+SPEC = [("NAME", "[a-z]+"), ("NUMBER", "[0-9]+"), ("SPACE", "\\ +")]
+
+
+class TestTokenStream(unittest.TestCase):
+    def test_same_tokens_as_lex(self) -> None:
+        rng = random.Random(13)
+        for _ in range(100):
+            lexer = Lexer(random_spec(rng))
+            for _ in range(5):
+                word = random_word(rng, "abcd \n", 30)
+                self.assertEqual(
+                    as_tokens(lambda: lexer.lex_stream(word)),
+                    lexer.lex(word),
+                    (lexer.spec, word),
+                )
+
+    def test_access(self) -> None:
+        stream = Lexer(SPEC).lex_stream("ab 12  cd")
+        self.assertEqual(len(stream), 5)
+        self.assertEqual(stream[0], ("NAME", "ab"))
+        self.assertEqual(stream[-1], ("NAME", "cd"))
+        self.assertEqual(stream.name(1), "SPACE")
+        self.assertEqual(stream.lexeme(2), "12")
+        self.assertEqual(stream.span(3), (5, 7))
+        self.assertEqual(list(stream.rules), [0, 2, 1, 2, 0])
+        with self.assertRaises(IndexError):
+            stream[5]
+
+    def test_slice(self) -> None:
+        stream = Lexer(SPEC).lex_stream("ab 12  cd")
+        tail = stream[2:]
+        self.assertEqual(list(tail), list(stream)[2:])
+        self.assertIs(tail.text, stream.text)
+        self.assertEqual(tail.span(0), (3, 5))
+        self.assertEqual(
+            list(stream[::2]), [("NAME", "ab"), ("NUMBER", "12"), ("NAME", "cd")]
+        )
+        self.assertEqual(len(stream[5:]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from ..Codegen import generate_module
+from ..Lexer import Lexer, LexError
+from .randomized import as_tokens, random_word, reference_lex
+
+import os
+import random
+import tempfile
+import unittest
+from collections.abc import Iterator
+
+RULES = [
+    "[a-z]+",
+    "[α-ω]+",
+    "([a-z]|[À-ɏ])+",
+    "[一-鿿]+",
+    "[\U0001f600-\U0010ffff]",
+    "é",
+    "ωω",
+    "\\ ",
+]
+ALPHABET = "azéÀɏαω一鿿\U0001f600\U0010ffff ?"
+
+
+def random_unicode_spec(rng: random.Random) -> list[tuple[str, str]]:
+    rules = rng.sample(RULES, rng.randint(2, len(RULES)))
+    return [(f"R{i}", regex) for i, regex in enumerate(rules)]
+
+
+class TestUnicode(unittest.TestCase):
+    def test_same_tokens_as_re(self) -> None:
+        rng = random.Random(17)
+        for _ in range(60):
+            spec = random_unicode_spec(rng)
+            lexer = Lexer(spec)
+            lazy = Lexer(spec, lazy=True, max_states=3)
+            namespace: dict = {}
+            exec(generate_module(lexer), namespace)
+            for _ in range(5):
+                word = random_word(rng, ALPHABET, 20)
+                tokens = lexer.lex(word)
+                expected = reference_lex(spec, word)
+                if expected is None:
+                    self.assertEqual(tokens[0][0], "", (spec, word))
+                else:
+                    self.assertEqual(tokens, expected, (spec, word))
+                self.assertEqual(lazy.lex(word), tokens, (spec, word))
+                self.assertEqual(namespace["lex"](word), tokens, (spec, word))
+                self.assertEqual(as_tokens(lambda: lexer.lex_iter(word)), tokens)
+
+    def test_ranges_stay_intervals(self) -> None:
+        table = Lexer([("ANY", "[\x00-\U0010ffff]+")]).table
+        self.assertEqual(table.n_classes, 2)
+        self.assertLessEqual(len(table.classes.bounds), 2)
+
+    def test_lex_file(self) -> None:
+        rng = random.Random(18)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input")
+
+            def file_tokens(lexer: Lexer, data: bytes) -> Iterator[tuple[str, str]]:
+                with open(path, "wb") as f:
+                    f.write(data)
+                for name, start, end in lexer.lex_file(path):
+                    yield name, data[start:end].decode()
+
+            for _ in range(60):
+                spec = random_unicode_spec(rng)
+                word = random_word(rng, ALPHABET, 20)
+                for lexer in (Lexer(spec), Lexer(spec, lazy=True, max_states=3)):
+                    tokens = as_tokens(lambda: file_tokens(lexer, word.encode()))
+                    expected = lexer.lex(word)
+                    if expected and expected[0][0] == "":
+                        # positions are in bytes, only the tokens must agree
+                        self.assertEqual(tokens[0][0], "", (spec, word))
+                    else:
+                        self.assertEqual(tokens, expected, (spec, word))
+
+            lexer = Lexer([("GREEK", "[α-ω]+"), ("SPACE", "\\ ")])
+            with self.assertRaises(LexError) as raised:
+                list(file_tokens(lexer, "αβ γ!".encode()))
+            error = raised.exception
+            self.assertEqual((error.position, error.line, error.column), (7, 0, 7))
+
+            with self.assertRaises(LexError) as raised:
+                list(file_tokens(lexer, b"\xce\xb1\xff"))
+            self.assertEqual(raised.exception.position, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()